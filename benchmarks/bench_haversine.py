@@ -0,0 +1,84 @@
+"""
+Micro-benchmark: scalar ranking loop vs. the NumPy path search uses.
+
+    python benchmarks/bench_haversine.py
+
+Both sides do the same job as _rank_candidates: distances for every
+candidate, keep those within the radius, score them with the default
+blended ranking (logic/ranking.py) and return the 20 best. The NumPy side
+is the production path: haversine_km_many, ranking.features and top_k.
+"""
+import os
+import random
+import sys
+import time
+import timeit
+
+import django
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "emerg_django.settings")
+django.setup()
+
+import numpy as np  # noqa: E402
+
+from logic.compat import ROLES, compat_bit  # noqa: E402
+from logic.geo import haversine_km_many  # noqa: E402
+from logic.mvp import haversine_km  # noqa: E402
+from logic.ranking import ROLE_FIT, features, ranking_config, top_k  # noqa: E402
+
+ORIGIN = (53.3498, -6.2603)
+RADIUS_KM = 10
+MY_ROLE = "host"
+SIZES = (200, 10_000, 100_000)
+
+
+def scalar_top20(lats, lons, actives, roles, photos, now):
+    config = ranking_config()
+    weights = config["weights"]
+    mine = ROLES.index(MY_ROLE)
+    scored = []
+    for i, (la, lo) in enumerate(zip(lats, lons)):
+        d = haversine_km(ORIGIN[0], ORIGIN[1], la, lo)
+        if d > RADIUS_KM:
+            continue
+        recency = 2 ** (-max(0.0, now - actives[i]) / config["recency_half_life"])
+        score = (
+            weights["distance"] * (1.0 - d / RADIUS_KM)
+            + weights["recency"] * recency
+            + weights["role"] * ROLE_FIT[mine][roles[i]]
+            + weights["photo"] * photos[i]
+        )
+        scored.append((-score, i))
+    scored.sort()
+    return [i for _, i in scored[:20]]
+
+
+def batch_top20(lats, lons, actives, compats, photos):
+    dists = haversine_km_many(ORIGIN[0], ORIGIN[1], lats, lons)
+    inside = np.flatnonzero(dists <= RADIUS_KM)
+    best = top_k(features(MY_ROLE, RADIUS_KM, dists[inside], actives[inside], compats[inside], photos[inside]), 20)
+    return inside[best].tolist()
+
+
+def main():
+    rnd = random.Random(42)
+    now = time.time()
+    print(f"{'n':>8} {'scalar ms':>10} {'numpy ms':>10} {'speedup':>8}")
+    for n in SIZES:
+        lats = [ORIGIN[0] + rnd.uniform(-0.3, 0.3) for _ in range(n)]
+        lons = [ORIGIN[1] + rnd.uniform(-0.5, 0.5) for _ in range(n)]
+        actives = [now - rnd.uniform(0, 86400) for _ in range(n)]
+        roles = [rnd.randrange(len(ROLES)) for _ in range(n)]
+        photos = [float(rnd.random() < 0.8) for _ in range(n)]
+        compats = np.array([compat_bit("female", "man", ROLES[r]) for r in roles])
+        arrays = (np.array(lats), np.array(lons), np.array(actives), compats, np.array(photos))
+        runs = max(3, 20_000 // n)
+        scalar = min(timeit.repeat(lambda: scalar_top20(lats, lons, actives, roles, photos, now),
+                                   number=runs, repeat=3)) / runs
+        batch = min(timeit.repeat(lambda: batch_top20(*arrays), number=runs, repeat=3)) / runs
+        print(f"{n:>8} {scalar * 1e3:>10.3f} {batch * 1e3:>10.3f} {scalar / batch:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -11,7 +11,12 @@ python manage.py collectstatic --noinput
 : "${PORT:=10000}"
 : "${WEB_CONCURRENCY:=2}"
 
-exec gunicorn emerg_django.wsgi:application \
+# Shared geo index updater (one per machine; workers fall back to SQL without it)
+python manage.py mvp_geo_index &
+
+# ASGI (uvicorn workers) so /api/mvp/stream/ can hold SSE connections open
+exec gunicorn emerg_django.asgi:application \
+  --worker-class uvicorn.workers.UvicornWorker \
   --bind 0.0.0.0:${PORT} \
   --workers ${WEB_CONCURRENCY} \
   --timeout 120
\ No newline at end of file
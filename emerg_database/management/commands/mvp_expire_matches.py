@@ -0,0 +1,22 @@
+# emerg_database/management/commands/mvp_expire_matches.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from logic.match_sweeper import expire_overdue_matches
+
+
+class Command(BaseCommand):
+    help = 'Expires every MVP match past its expires_at in bulk'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--every', type=int, default=0, help='Keep running, sweeping every N seconds')
+
+    def handle(self, *args, **options):
+        while True:
+            expired = expire_overdue_matches(batch_size=options['batch_size'])
+            self.stdout.write(f"Expired matches: {expired}")
+            if not options['every']:
+                break
+            time.sleep(options['every'])
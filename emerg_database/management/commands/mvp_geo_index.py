@@ -0,0 +1,19 @@
+# emerg_database/management/commands/mvp_geo_index.py
+from django.core.management.base import BaseCommand
+
+from logic.geo_index import Updater, build, index_path
+
+
+class Command(BaseCommand):
+    help = 'Maintains the shared MVP geo index file read by every web worker'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Build the index once and exit')
+
+    def handle(self, *args, **options):
+        if options['once']:
+            count = build()
+            self.stdout.write(f"Geo index: {count} users -> {index_path()}")
+            return
+        self.stdout.write(f"Maintaining geo index at {index_path()}")
+        Updater().run()
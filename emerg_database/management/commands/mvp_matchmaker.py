@@ -0,0 +1,21 @@
+# emerg_database/management/commands/mvp_matchmaker.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from logic.matchmaker import propose_matches
+
+
+class Command(BaseCommand):
+    help = 'Pairs nearby active MVP users and pins the proposals to their search feeds'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--every', type=int, default=0, help='Keep running, pairing every N seconds')
+
+    def handle(self, *args, **options):
+        while True:
+            pairs = propose_matches()
+            self.stdout.write(f"Proposed pairs: {pairs}")
+            if not options['every']:
+                break
+            time.sleep(options['every'])
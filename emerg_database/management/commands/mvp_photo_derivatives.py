@@ -0,0 +1,24 @@
+# emerg_database/management/commands/mvp_photo_derivatives.py
+from django.core.management.base import BaseCommand
+
+from emerg_database.models import Photo
+from logic.photo_pipeline import generate_derivatives
+
+
+class Command(BaseCommand):
+    help = 'Generates missing thumbnail/WebP derivatives for MVP photos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Regenerate derivatives for every photo')
+
+    def handle(self, *args, **options):
+        photos = Photo.objects.all() if options['all'] else Photo.objects.filter(thumbnail='')
+        done = failed = 0
+        for photo in photos.iterator(chunk_size=200):
+            try:
+                generate_derivatives(photo)
+                done += 1
+            except Exception as e:
+                failed += 1
+                self.stderr.write(f"Photo {photo.id}: {e}")
+        self.stdout.write(self.style.SUCCESS(f"Derivatives generated: {done}, failed: {failed}"))
@@ -0,0 +1,33 @@
+from django.db import migrations, models
+
+
+def backfill_geocell(apps, schema_editor):
+    from logic.geo import geocell_for
+
+    SessionUser = apps.get_model("emerg_database", "SessionUser")
+    batch = []
+    qs = SessionUser.objects.filter(lat__isnull=False, lon__isnull=False).only("id", "lat", "lon")
+    for user in qs.iterator(chunk_size=2000):
+        user.geocell = geocell_for(user.lat, user.lon)
+        batch.append(user)
+        if len(batch) >= 2000:
+            SessionUser.objects.bulk_update(batch, ["geocell"])
+            batch = []
+    if batch:
+        SessionUser.objects.bulk_update(batch, ["geocell"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("emerg_database", "0004_sessionuser_age_verified_block_report"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="sessionuser",
+            name="geocell",
+            field=models.BigIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.RunPython(backfill_geocell, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("emerg_database", "0005_sessionuser_geocell"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="sessionuser",
+            index=models.Index(fields=["lat", "lon"], name="sessionuser_lat_lon_idx"),
+        ),
+    ]
@@ -0,0 +1,39 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_primary_photo(apps, schema_editor):
+    SessionUser = apps.get_model("emerg_database", "SessionUser")
+    Photo = apps.get_model("emerg_database", "Photo")
+
+    latest = {}
+    for photo_id, user_id in Photo.objects.order_by("created_at", "id").values_list("id", "user_id").iterator():
+        latest[user_id] = photo_id
+    batch = [SessionUser(id=user_id, primary_photo_id=photo_id) for user_id, photo_id in latest.items()]
+    SessionUser.objects.bulk_update(batch, ["primary_photo"], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("emerg_database", "0006_sessionuser_lat_lon_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="sessionuser",
+            name="primary_photo",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to="emerg_database.photo",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="photo",
+            index=models.Index(fields=["user", "-created_at"], name="photo_user_created_idx"),
+        ),
+        migrations.RunPython(backfill_primary_photo, migrations.RunPython.noop),
+    ]
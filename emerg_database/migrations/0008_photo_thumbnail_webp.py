@@ -0,0 +1,22 @@
+from django.db import migrations, models
+import emerg_database.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("emerg_database", "0007_sessionuser_primary_photo"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="photo",
+            name="thumbnail",
+            field=models.ImageField(blank=True, upload_to=emerg_database.models.session_photo_upload_to),
+        ),
+        migrations.AddField(
+            model_name="photo",
+            name="webp",
+            field=models.FileField(blank=True, upload_to=emerg_database.models.session_photo_upload_to),
+        ),
+    ]
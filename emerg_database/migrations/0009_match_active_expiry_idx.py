@@ -0,0 +1,19 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("emerg_database", "0008_photo_thumbnail_webp"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="match",
+            index=models.Index(
+                condition=models.Q(("status__in", ["matched", "confirmed"])),
+                fields=["expires_at"],
+                name="match_active_expiry_idx",
+            ),
+        ),
+    ]
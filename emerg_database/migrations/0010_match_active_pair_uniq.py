@@ -0,0 +1,38 @@
+from django.db import migrations, models
+import django.db.models.functions.comparison
+
+
+def cancel_duplicate_active_matches(apps, schema_editor):
+    """Keep only the newest active match per unordered pair before adding the constraint."""
+    Match = apps.get_model("emerg_database", "Match")
+    seen = set()
+    duplicates = []
+    active = Match.objects.filter(status__in=["matched", "confirmed"]).order_by("-created_at", "-id")
+    for match_id, user1_id, user2_id in active.values_list("id", "user1_id", "user2_id").iterator():
+        pair = (min(user1_id, user2_id), max(user1_id, user2_id))
+        if pair in seen:
+            duplicates.append(match_id)
+        else:
+            seen.add(pair)
+    if duplicates:
+        Match.objects.filter(id__in=duplicates).update(status="cancelled")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("emerg_database", "0009_match_active_expiry_idx"),
+    ]
+
+    operations = [
+        migrations.RunPython(cancel_duplicate_active_matches, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="match",
+            constraint=models.UniqueConstraint(
+                django.db.models.functions.comparison.Least("user1", "user2"),
+                django.db.models.functions.comparison.Greatest("user1", "user2"),
+                condition=models.Q(("status__in", ["matched", "confirmed"])),
+                name="match_active_pair_uniq",
+            ),
+        ),
+    ]
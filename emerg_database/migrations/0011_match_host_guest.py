@@ -0,0 +1,44 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("emerg_database", "0010_match_active_pair_uniq"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="match",
+            name="host",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to="emerg_database.sessionuser",
+            ),
+        ),
+        migrations.AddField(
+            model_name="match",
+            name="guest",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to="emerg_database.sessionuser",
+            ),
+        ),
+        migrations.AddField(
+            model_name="match",
+            name="host_lat",
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="match",
+            name="host_lon",
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,52 @@
+from django.db import migrations, models
+from django.db.models import OuterRef, Q, Subquery
+import django.db.models.deletion
+
+
+def backfill_active_match(apps, schema_editor):
+    SessionUser = apps.get_model("emerg_database", "SessionUser")
+    Match = apps.get_model("emerg_database", "Match")
+    latest = (
+        Match.objects.filter(Q(user1=OuterRef("pk")) | Q(user2=OuterRef("pk")), status__in=["matched", "confirmed"])
+        .order_by("-created_at")
+        .values("id")[:1]
+    )
+    SessionUser.objects.update(active_match=Subquery(latest))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("emerg_database", "0011_match_host_guest"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="sessionuser",
+            name="active_match",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to="emerg_database.match",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="match",
+            index=models.Index(
+                condition=models.Q(("status__in", ["matched", "confirmed"])),
+                fields=["user1"],
+                name="match_active_user1_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="match",
+            index=models.Index(
+                condition=models.Q(("status__in", ["matched", "confirmed"])),
+                fields=["user2"],
+                name="match_active_user2_idx",
+            ),
+        ),
+        migrations.RunPython(backfill_active_match, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("emerg_database", "0013_pass"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="sessionuser",
+            name="last_active",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,33 @@
+from django.db import migrations, models
+
+
+def backfill_compat(apps, schema_editor):
+    from logic.compat import compat_bit
+
+    SessionUser = apps.get_model("emerg_database", "SessionUser")
+    batch = []
+    qs = SessionUser.objects.only("id", "gender", "looking_for", "role")
+    for user in qs.iterator(chunk_size=2000):
+        user.compat = compat_bit(user.gender, user.looking_for, user.role)
+        batch.append(user)
+        if len(batch) >= 2000:
+            SessionUser.objects.bulk_update(batch, ["compat"])
+            batch = []
+    if batch:
+        SessionUser.objects.bulk_update(batch, ["compat"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("emerg_database", "0014_sessionuser_last_active_default"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="sessionuser",
+            name="compat",
+            field=models.IntegerField(db_index=True, default=0),
+        ),
+        migrations.RunPython(backfill_compat, migrations.RunPython.noop),
+    ]
@@ -3,6 +3,9 @@ from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.conf import settings
 from decimal import Decimal
 from django.utils import timezone
+from django.db.models.functions import Greatest, Least
+
+from logic.compat import compat_bit
 
 # -------- Custom User (keep as is) --------
 class UserManager(BaseUserManager):
@@ -495,14 +498,40 @@ class SessionUser(models.Model):
     looking_for = models.CharField(max_length=10, choices=LOOKING_FOR_CHOICES, blank=True)
     role = models.CharField(max_length=10, choices=ROLE_CHOICES, default='either')
     radius = models.IntegerField(default=10, help_text="Search radius in km")
+    # One-hot compatibility class of gender/looking_for/role (logic/compat.py), set in save()
+    compat = models.IntegerField(default=0, db_index=True)
     
     lat = models.FloatField(null=True, blank=True)
     lon = models.FloatField(null=True, blank=True)
+    # Fixed lat/lon grid cell (see logic/geo.py), kept in sync by update_location
+    geocell = models.BigIntegerField(null=True, blank=True, db_index=True)
     
-    last_active = models.DateTimeField(auto_now=True)
+    # Written in bulk by logic/presence.py, not on every save()
+    last_active = models.DateTimeField(default=timezone.now)
     created_at = models.DateTimeField(auto_now_add=True)
 
     age_verified_at = models.DateTimeField(null=True, blank=True)
+    # Latest uploaded photo, set by update_profile (avoids photos joins / N+1)
+    primary_photo = models.ForeignKey(
+        'Photo', null=True, blank=True, on_delete=models.SET_NULL, related_name='+'
+    )
+    # Latest matched/confirmed match, maintained by logic/matches.py (poll is one PK lookup)
+    active_match = models.ForeignKey(
+        'Match', null=True, blank=True, on_delete=models.SET_NULL, related_name='+'
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["lat", "lon"], name="sessionuser_lat_lon_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.compat = compat_bit(self.gender, self.looking_for, self.role)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'gender', 'looking_for', 'role'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'compat'}
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"Session {self.session_id[:8]}..."
 
@@ -512,8 +541,16 @@ def session_photo_upload_to(instance, filename):
 class Photo(models.Model):
     user = models.ForeignKey('SessionUser', on_delete=models.CASCADE, related_name='photos')
     image = models.ImageField(upload_to=session_photo_upload_to)
+    # Derivatives written next to the original by logic/photo_pipeline.py
+    thumbnail = models.ImageField(upload_to=session_photo_upload_to, blank=True)
+    webp = models.FileField(upload_to=session_photo_upload_to, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "-created_at"], name="photo_user_created_idx"),
+        ]
+
 class Match(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'), # Match created but not confirmed by users (maybe auto-match logic?) 
@@ -524,6 +561,8 @@ class Match(models.Model):
         ('cancelled', 'Cancelled'),
         ('expired', 'Expired'),
     ]
+    # Time both users have to confirm before the match expires
+    TTL = timezone.timedelta(minutes=30)
     
     user1 = models.ForeignKey('SessionUser', on_delete=models.CASCADE, related_name='matches_as_user1')
     user2 = models.ForeignKey('SessionUser', on_delete=models.CASCADE, related_name='matches_as_user2')
@@ -531,14 +570,49 @@ class Match(models.Model):
     
     user1_confirmed = models.BooleanField(default=False)
     user2_confirmed = models.BooleanField(default=False)
+
+    # Frozen when both confirm (roles may change afterwards)
+    host = models.ForeignKey('SessionUser', null=True, blank=True, on_delete=models.SET_NULL, related_name='+')
+    guest = models.ForeignKey('SessionUser', null=True, blank=True, on_delete=models.SET_NULL, related_name='+')
+    host_lat = models.FloatField(null=True, blank=True)
+    host_lon = models.FloatField(null=True, blank=True)
     
     created_at = models.DateTimeField(auto_now_add=True)
     expires_at = models.DateTimeField()
 
+    class Meta:
+        indexes = [
+            # Sweeper: active matches ordered by deadline (logic/match_sweeper.py)
+            models.Index(
+                fields=["expires_at"],
+                condition=models.Q(status__in=["matched", "confirmed"]),
+                name="match_active_expiry_idx",
+            ),
+            # Re-pointing SessionUser.active_match after cancel/expiry (logic/matches.py)
+            models.Index(
+                fields=["user1"],
+                condition=models.Q(status__in=["matched", "confirmed"]),
+                name="match_active_user1_idx",
+            ),
+            models.Index(
+                fields=["user2"],
+                condition=models.Q(status__in=["matched", "confirmed"]),
+                name="match_active_user2_idx",
+            ),
+        ]
+        constraints = [
+            # At most one active match per unordered pair (logic/likes.py)
+            models.UniqueConstraint(
+                Least("user1", "user2"),
+                Greatest("user1", "user2"),
+                condition=models.Q(status__in=["matched", "confirmed"]),
+                name="match_active_pair_uniq",
+            ),
+        ]
+
     def save(self, *args, **kwargs):
         if not self.expires_at:
-            # Default expiration: 30 minutes
-            self.expires_at = timezone.now() + timezone.timedelta(minutes=30)
+            self.expires_at = timezone.now() + self.TTL
         super().save(*args, **kwargs)
 
 class Block(models.Model):
@@ -565,6 +639,19 @@ class Like(models.Model):
     class Meta:
         unique_together = ('from_user', 'to_user')
 
+class Pass(models.Model):
+    # Skipped candidates; hidden from search for MVP_PASS_TTL (logic/passes.py)
+    from_user = models.ForeignKey('SessionUser', on_delete=models.CASCADE, related_name='passes_given')
+    to_user = models.ForeignKey('SessionUser', on_delete=models.CASCADE, related_name='passes_received')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('from_user', 'to_user')
+        indexes = [
+            # Pruning expired passes (logic/passes.py)
+            models.Index(fields=["created_at"], name="pass_created_idx"),
+        ]
+
 # ==========================================
 # ============= MVP MODELS END =============
 # ==========================================
\ No newline at end of file
@@ -3,3 +3,8 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'emerg_django.settings')
 application = get_asgi_application()
+
+# MVP background work (events, sweeps, presence flush, matchmaker): logic/background.py
+from logic.background import start_background_jobs  # noqa: E402
+
+start_background_jobs()
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -149,3 +150,88 @@ MEDIA_ROOT = "/tmp/media" if RENDER else (BASE_DIR / "media")
 CSRF_TRUSTED_ORIGINS = [o for o in os.getenv("CSRF_TRUSTED_ORIGINS", "").split(",") if o]
 X_FRAME_OPTIONS = "DENY"
 SECURE_REFERRER_POLICY = "same-origin"
+
+# -----------------------------
+# Cache
+# -----------------------------
+# Shared across gunicorn workers when REDIS_URL is set; per-process otherwise.
+REDIS_URL = os.getenv("REDIS_URL")
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+MVP_SESSION_CACHE_TTL = int(os.getenv("MVP_SESSION_CACHE_TTL", "30"))  # seconds
+MVP_BLOCK_CACHE_TTL = int(os.getenv("MVP_BLOCK_CACHE_TTL", "600"))  # dropped early by block events
+MVP_SESSION_TOKEN_MAX_AGE = int(os.getenv("MVP_SESSION_TOKEN_MAX_AGE", str(30 * 24 * 3600)))  # seconds
+
+# -----------------------------
+# MVP realtime
+# -----------------------------
+# /api/mvp/stream/ (Server-Sent Events) needs the ASGI app: see deployd/start.sh
+MVP_STREAM_KEEPALIVE = int(os.getenv("MVP_STREAM_KEEPALIVE", "20"))  # seconds between keepalive comments
+MVP_STREAM_MAX_AGE = int(os.getenv("MVP_STREAM_MAX_AGE", "300"))  # client reconnects after this
+# Stream URLs carry a ticket from /api/mvp/stream/ticket/, valid this long (seconds)
+MVP_STREAM_TICKET_MAX_AGE = int(os.getenv("MVP_STREAM_TICKET_MAX_AGE", "120"))
+# In-process expiry sweep per worker (seconds, 0 = off; see `manage.py mvp_expire_matches`)
+MVP_MATCH_SWEEP_INTERVAL = int(os.getenv("MVP_MATCH_SWEEP_INTERVAL", "30"))
+# Presence / GPS write-behind (logic/presence.py)
+MVP_PRESENCE_FLUSH_INTERVAL = int(os.getenv("MVP_PRESENCE_FLUSH_INTERVAL", "5"))  # seconds
+MVP_PRESENCE_CACHE_TTL = int(os.getenv("MVP_PRESENCE_CACHE_TTL", "600"))  # latest fix in the shared cache
+MVP_LOCATION_MIN_MOVE_M = int(os.getenv("MVP_LOCATION_MIN_MOVE_M", "50"))  # smaller moves are presence only
+
+# -----------------------------
+# MVP search & swipes
+# -----------------------------
+# Largest batch /api/mvp/swipes/ accepts in one request
+MVP_SWIPE_BATCH_MAX = int(os.getenv("MVP_SWIPE_BATCH_MAX", "50"))
+# Passed candidates stay out of search this long (seconds); older passes are pruned
+MVP_PASS_TTL = int(os.getenv("MVP_PASS_TTL", str(7 * 24 * 3600)))
+MVP_PASS_PRUNE_INTERVAL = int(os.getenv("MVP_PASS_PRUNE_INTERVAL", "3600"))  # seconds, 0 = off
+# Candidates ranked per search; /api/mvp/search/?cursor= pages through them from the cache
+MVP_SEARCH_WINDOW = int(os.getenv("MVP_SEARCH_WINDOW", "200"))
+MVP_SEARCH_WINDOW_TTL = int(os.getenv("MVP_SEARCH_WINDOW_TTL", "120"))  # seconds
+# Repeated fresh searches within this many seconds reuse the window; concurrent
+# ones wait up to MVP_SEARCH_COALESCE_WAIT seconds for the first to finish
+MVP_SEARCH_RESULT_TTL = int(os.getenv("MVP_SEARCH_RESULT_TTL", "20"))
+MVP_SEARCH_COALESCE_WAIT = int(os.getenv("MVP_SEARCH_COALESCE_WAIT", "5"))
+# Sparse areas: widen the radius (x2 steps up to MVP_SEARCH_MAX_RADIUS km) until
+# MVP_DENSITY_TARGET people are covered; geocell counts cached per span (logic/density.py).
+# Also caps every stored SessionUser.radius.
+MVP_SEARCH_MAX_RADIUS = int(os.getenv("MVP_SEARCH_MAX_RADIUS", "100"))
+MVP_DENSITY_TARGET = int(os.getenv("MVP_DENSITY_TARGET", "20"))
+MVP_DENSITY_CACHE_TTL = int(os.getenv("MVP_DENSITY_CACHE_TTL", "300"))  # seconds
+MVP_DENSITY_ACTIVE_WINDOW = int(os.getenv("MVP_DENSITY_ACTIVE_WINDOW", "900"))  # "active" = seen this recently
+MVP_RETRY_AFTER_MIN = int(os.getenv("MVP_RETRY_AFTER_MIN", "5"))  # seconds
+MVP_RETRY_AFTER_MAX = int(os.getenv("MVP_RETRY_AFTER_MAX", "300"))
+# Candidate ranking overrides, e.g. {"weights": {"recency": 1.0}} (defaults: logic/ranking.py)
+MVP_RANKING = {}
+# Shared geo index (logic/geo_index.py), maintained by `manage.py mvp_geo_index`
+MVP_GEO_INDEX_PATH = os.getenv(
+    "MVP_GEO_INDEX_PATH",
+    os.path.join("/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir(), "mvp_geo_index.bin"),
+)
+MVP_GEO_INDEX_INTERVAL = int(os.getenv("MVP_GEO_INDEX_INTERVAL", "2"))  # min seconds between rebuilds
+MVP_GEO_INDEX_REFRESH = int(os.getenv("MVP_GEO_INDEX_REFRESH", "300"))  # full snapshot at least this often
+MVP_GEO_INDEX_MAX_AGE = int(os.getenv("MVP_GEO_INDEX_MAX_AGE", "900"))  # older index: search uses SQL
+# Background matchmaker (logic/matchmaker.py): pairs nearby active users per
+# geocell and pins each proposal to the top of both search feeds
+MVP_MATCHMAKER_INTERVAL = int(os.getenv("MVP_MATCHMAKER_INTERVAL", "60"))  # seconds, 0 = off
+MVP_MATCHMAKER_TTL = int(os.getenv("MVP_MATCHMAKER_TTL", "300"))  # seconds a proposal is kept
+MVP_MATCHMAKER_ACTIVE_WINDOW = int(os.getenv("MVP_MATCHMAKER_ACTIVE_WINDOW", "900"))  # only users seen this recently
+MVP_MATCHMAKER_CELL_MAX = int(os.getenv("MVP_MATCHMAKER_CELL_MAX", "300"))  # most recently active per geocell
+
+# -----------------------------
+# MVP photos
+# -----------------------------
+MVP_PHOTO_WORKERS = int(os.getenv("MVP_PHOTO_WORKERS", "2"))  # background thumbnail threads per worker
+MVP_PHOTO_DERIVATIVES_ASYNC = os.getenv("MVP_PHOTO_DERIVATIVES_ASYNC", "True") == "True"
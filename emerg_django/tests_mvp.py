@@ -1,6 +1,37 @@
-from django.test import TestCase, Client
-from emerg_database.models import SessionUser, Match, Like
+import asyncio
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import numpy as np
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db import OperationalError, connection
+from django.test import TestCase, TransactionTestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from emerg_database.models import SessionUser, Match, Like, Photo, Block, Pass
 from django.core.files.uploadedfile import SimpleUploadedFile
+from logic.geo import KM_PER_DEG_LAT, bounding_box, geocell_for, geocell_ranges, haversine_km_many
+from logic import event_bus, geo_index, presence, ranking
+from logic.blocks import blocked_ids_for
+from logic.compat import compat_bit, compat_values, compatible, compatible_mask
+from logic.likes import active_match_between, like
+from logic.match_sweeper import expire_overdue_matches
+from logic.matchmaker import proposal_for, propose_matches
+from logic.matches import point_active_match
+from logic.passes import prune_passes
+from logic.mvp import haversine_km
+from logic.photo_pipeline import THUMB_SIZE
+from logic.search_pages import fresh_window, invalidate_windows
+from logic.session_cache import load_session_user
+from logic.session_tokens import issue_token, read_token
 
 class MVPTests(TestCase):
     def setUp(self):
@@ -70,3 +101,820 @@ class MVPTests(TestCase):
         self.assertTrue(match.user2_confirmed)
         self.assertEqual(match.status, 'confirmed')
 
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+# MVP_DENSITY_TARGET=0: these fixtures are tiny, keep the radius as given
+@override_settings(MVP_GEO_INDEX_PATH=os.path.join(tempfile.mkdtemp(), 'geo.bin'), MVP_DENSITY_TARGET=0)
+class MVPSearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def tearDown(self):
+        presence.flush()  # inside the test transaction: nothing leaks into the next test
+        if os.path.exists(geo_index.index_path()):
+            os.remove(geo_index.index_path())
+
+    def make_user(self, session_id, lat, lon, gender='female', looking_for='man', role='either'):
+        user = SessionUser.objects.create(
+            session_id=session_id,
+            gender=gender,
+            looking_for=looking_for,
+            role=role,
+            lat=lat,
+            lon=lon,
+            geocell=geocell_for(lat, lon),
+            age_verified_at=timezone.now(),
+        )
+        user.primary_photo = Photo.objects.create(
+            user=user, image=SimpleUploadedFile('p.gif', b'GIF89a', content_type='image/gif')
+        )
+        user.save(update_fields=['primary_photo'])
+        return user
+
+    def search(self, session_id):
+        res = self.client.get('/api/mvp/search/', HTTP_X_SESSION_ID=session_id)
+        self.assertEqual(res.status_code, 200)
+        return res.json()['candidates']
+
+    def test_geocell_ranges_cover_antimeridian(self):
+        ranges = geocell_ranges(0.0, 179.99, 20)
+        east = geocell_for(0.0, 179.99)
+        west = geocell_for(0.0, -179.99)
+        self.assertTrue(any(lo <= east <= hi for lo, hi in ranges))
+        self.assertTrue(any(lo <= west <= hi for lo, hi in ranges))
+
+    def test_bounding_box_scales_longitude_and_wraps(self):
+        lat_lo, lat_hi, spans = bounding_box(60.0, 179.9, 10)
+        self.assertAlmostEqual(lat_hi - lat_lo, 20 / KM_PER_DEG_LAT, places=6)
+        self.assertEqual(len(spans), 2)
+        (east_lo, east_hi), (west_lo, west_hi) = spans
+        self.assertEqual((east_hi, west_lo), (180.0, -180.0))
+        # At 60N a degree of longitude is about half as long as at the equator.
+        self.assertGreater((east_hi - east_lo) + (west_hi - west_lo), 2 * 10 / KM_PER_DEG_LAT * 1.9)
+        self.assertIsNone(bounding_box(89.99, 0.0, 10)[2])
+
+        # The box encloses the haversine circle: points just inside 10 km stay in.
+        lat_lo, lat_hi, [(lon_lo, lon_hi)] = bounding_box(10.0, 20.0, 10)
+        for lat, lon in ((10.08989, 20.0), (10.0, 20.0912)):  # ~9.995 km north / east
+            self.assertLess(haversine_km(10.0, 20.0, lat, lon), 10)
+            self.assertTrue(lat_lo <= lat <= lat_hi and lon_lo <= lon <= lon_hi)
+
+    def test_search_across_antimeridian(self):
+        me = self.make_user('me', -16.5, 179.99, gender='man', looking_for='female')
+        other = self.make_user('other', -16.5, -179.99)
+        ids = [c['id'] for c in self.search(me.session_id)]
+        self.assertEqual(ids, [other.id])
+
+    def test_haversine_km_many_matches_scalar_haversine(self):
+        lats = [53.35 + i * 0.01 for i in range(40)]
+        lons = [-6.26 + i * 0.02 for i in range(40)]
+        dists = haversine_km_many(53.35, -6.26, lats, lons)
+        for got, la, lo in zip(dists.tolist(), lats, lons):
+            self.assertAlmostEqual(got, haversine_km(53.35, -6.26, la, lo), places=6)
+
+    def test_search_returns_nearest_regardless_of_activity(self):
+        me = self.make_user('me', 53.3498, -6.2603, gender='man', looking_for='female')
+        near = self.make_user('near', 53.3520, -6.2600)
+        far = self.make_user('far', 53.9000, -6.2600)
+        # Many more recently active users elsewhere must not crowd out "near".
+        for i in range(5):
+            self.make_user(f'other{i}', 40.0 + i, 3.0)
+
+        ids = [c['id'] for c in self.search(me.session_id)]
+        self.assertEqual(ids, [near.id])
+        self.assertNotIn(far.id, ids)
+
+    def test_block_hides_candidate_and_refreshes_cached_block_set(self):
+        me = self.make_user('me', 53.3498, -6.2603, gender='man', looking_for='female')
+        other = self.make_user('other', 53.3500, -6.2600)
+        self.assertEqual(blocked_ids_for(me.id), set())  # cached as empty
+
+        res = self.client.post('/api/mvp/block/', data={'user_id': other.id},
+                               content_type='application/json', HTTP_X_SESSION_ID='me')
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(blocked_ids_for(me.id), {other.id})
+        self.assertEqual(blocked_ids_for(other.id), {me.id})
+        self.assertEqual(self.search('me'), [])
+        res = self.client.post('/api/mvp/like/', data={'user_id': me.id},
+                               content_type='application/json', HTTP_X_SESSION_ID='other')
+        self.assertEqual(res.status_code, 403)
+
+    def test_search_and_poll_need_no_per_row_photo_queries(self):
+        me = self.make_user('me', 53.3498, -6.2603, gender='man', looking_for='female')
+        others = [self.make_user(f'c{i}', 53.35 + i * 0.001, -6.26) for i in range(5)]
+        self.search('me')  # warm session + block caches
+        invalidate_windows(me.id)  # force a rebuild instead of a result-cache hit
+
+        # liked ids subquery is inlined: one query for the whole result page
+        with self.assertNumQueries(1):
+            results = self.search('me')
+        self.assertEqual(len(results), 5)
+        self.assertTrue(all(r['photo_url'].startswith('/media/mvp/photos/') for r in results))
+
+        point_active_match(Match.objects.create(user1=me, user2=others[0], status='matched'))
+        with self.assertNumQueries(1):
+            state = self.client.get('/api/mvp/poll/', HTTP_X_SESSION_ID='me').json()
+        self.assertEqual(state['other_user']['photo_url'], others[0].primary_photo.image.url)
+
+    def test_photo_upload_sets_primary_photo(self):
+        me = self.make_user('me', 53.3498, -6.2603)
+        upload = SimpleUploadedFile('new.gif', b'GIF89a', content_type='image/gif')
+        self.client.post('/api/mvp/profile/', data={'photo': upload}, HTTP_X_SESSION_ID='me')
+        me.refresh_from_db()
+        self.assertEqual(me.primary_photo, me.photos.latest('created_at'))
+
+    @override_settings(MVP_PHOTO_DERIVATIVES_ASYNC=False)
+    def test_upload_generates_thumbnail_and_webp(self):
+        me = self.make_user('me', 53.3498, -6.2603, gender='man', looking_for='female')
+        other = self.make_user('other', 53.3500, -6.2600)
+        buf = io.BytesIO()
+        Image.new('RGB', (1200, 900), 'red').save(buf, 'PNG')
+        upload = SimpleUploadedFile('big.png', buf.getvalue(), content_type='image/png')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/mvp/profile/', data={'photo': upload}, HTTP_X_SESSION_ID='other')
+
+        photo = SessionUser.objects.get(id=other.id).primary_photo
+        self.assertTrue(photo.thumbnail.name.endswith('_thumb.jpg'))
+        self.assertTrue(photo.webp.name.endswith('_thumb.webp'))
+        with Image.open(photo.thumbnail.path) as thumb:
+            self.assertEqual(thumb.size, THUMB_SIZE)
+
+        [card] = self.search(me.session_id)
+        self.assertEqual(card['photo_url'], photo.thumbnail.url)
+        self.assertEqual(card['photo_webp_url'], photo.webp.url)
+
+    def test_location_update_sets_geocell(self):
+        me = self.make_user('me', None, None, gender='man', looking_for='female')
+        self.client.post('/api/mvp/location/', data={'lat': 53.35, 'lon': -6.26},
+                         content_type='application/json', HTTP_X_SESSION_ID=me.session_id)
+        presence.flush()
+        me.refresh_from_db()
+        self.assertEqual(me.geocell, geocell_for(53.35, -6.26))
+
+    def test_location_pings_are_buffered_and_flushed_in_bulk(self):
+        me = self.make_user('me', 53.3498, -6.2603, gender='man', looking_for='female')
+        other = self.make_user('other', 53.4000, -6.2603)
+        presence.flush()
+
+        def ping(lat, lon):
+            with self.assertNumQueries(0):
+                self.client.post('/api/mvp/location/', data={'lat': lat, 'lon': lon},
+                                 content_type='application/json', HTTP_X_SESSION_ID='me')
+
+        self.search('me')  # warm the session cache
+        ping(53.3499, -6.2603)  # ~11 m: presence only
+        self.assertIsNone(cache.get(f'mvp:presence:{me.id}'))
+        ping(53.3990, -6.2603)  # ~5.5 km north, right next to other
+
+        # Search sees the buffered fix before anything is written.
+        self.assertEqual(SessionUser.objects.get(id=me.id).lat, 53.3498)
+        with self.settings(MVP_SEARCH_WINDOW=1):
+            [card] = self.search('me')
+        self.assertEqual(card['id'], other.id)
+        self.assertLess(card['distance_km'], 0.5)
+
+        before = SessionUser.objects.get(id=other.id).last_active
+        self.client.get('/api/mvp/poll/', HTTP_X_SESSION_ID='other')
+        with self.assertNumQueries(2):
+            presence.flush()
+        me.refresh_from_db()
+        self.assertEqual((me.lat, me.geocell), (53.3990, geocell_for(53.3990, -6.2603)))
+        self.assertGreater(SessionUser.objects.get(id=other.id).last_active, before)
+
+    def test_bad_fixes_are_refused_and_failed_flushes_keep_the_batch(self):
+        me = self.make_user('me', 53.3498, -6.2603, gender='man', looking_for='female')
+        other = self.make_user('other', 53.4000, -6.2603)
+        for body in ('{"lat": NaN, "lon": 0}', '{"lat": 0, "lon": Infinity}', '{"lat": 91, "lon": 0}'):
+            res = self.client.post('/api/mvp/location/', data=body, content_type='application/json',
+                                   HTTP_X_SESSION_ID='me')
+            self.assertEqual(res.status_code, 400, body)
+        self.assertNotIn(me.id, presence._moved)
+
+        self.client.post('/api/mvp/location/', data={'lat': 53.4100, 'lon': -6.2603},
+                         content_type='application/json', HTTP_X_SESSION_ID='other')
+        with mock.patch.object(SessionUser.objects, 'bulk_update', side_effect=OperationalError('db down')):
+            with self.assertRaises(OperationalError):
+                presence.flush()
+        self.assertIn(other.id, presence._moved)
+        presence.flush()
+        other.refresh_from_db()
+        self.assertEqual(other.lat, 53.4100)
+
+    def test_cursor_pages_through_the_cached_window(self):
+        self.make_user('me', 53.3498, -6.2603, gender='man', looking_for='female')
+        others = [self.make_user(f'o{i}', 53.3498 + i * 0.0005, -6.2603) for i in range(25)]
+        res = self.client.get('/api/mvp/search/', HTTP_X_SESSION_ID='me').json()
+        self.assertEqual([c['id'] for c in res['candidates']], [o.id for o in others[:20]])
+
+        with self.assertNumQueries(0):
+            page = self.client.get('/api/mvp/search/', {'cursor': res['next_cursor']}, HTTP_X_SESSION_ID='me').json()
+        self.assertEqual([c['id'] for c in page['candidates']], [o.id for o in others[20:]])
+        self.assertIsNone(page['next_cursor'])
+
+        # Moving drops the window; the stale cursor falls back to a fresh search.
+        self.client.post('/api/mvp/location/', data={'lat': 53.3488, 'lon': -6.2603},
+                         content_type='application/json', HTTP_X_SESSION_ID='me')
+        page = self.client.get('/api/mvp/search/', {'cursor': res['next_cursor']}, HTTP_X_SESSION_ID='me').json()
+        self.assertEqual(len(page['candidates']), 20)
+        forged = self.client.get('/api/mvp/search/', {'cursor': 'x:y'}, HTTP_X_SESSION_ID='me').json()
+        self.assertEqual(len(forged['candidates']), 20)
+
+    def test_cursor_survives_a_swipe_batch(self):
+        self.make_user('me', 53.3498, -6.2603, gender='man', looking_for='female')
+        others = [self.make_user(f'o{i}', 53.3498 + i * 0.0005, -6.2603) for i in range(25)]
+        res = self.client.get('/api/mvp/search/', HTTP_X_SESSION_ID='me').json()
+        swipes = [{'user_id': c['id'], 'action': 'pass'} for c in res['candidates']]
+        self.client.post('/api/mvp/swipes/', data={'swipes': swipes},
+                         content_type='application/json', HTTP_X_SESSION_ID='me')
+
+        with self.assertNumQueries(0):  # no re-rank: the unseen cards come from the window
+            page = self.client.get('/api/mvp/search/', {'cursor': res['next_cursor']}, HTTP_X_SESSION_ID='me').json()
+        self.assertEqual([c['id'] for c in page['candidates']], [o.id for o in others[20:]])
+        # ...but a fresh search ranks again instead of reusing the swiped window.
+        self.assertEqual([c['id'] for c in self.search('me')], [o.id for o in others[20:]])
+
+    def test_compat_bits_match_the_preference_rules(self):
+        def sees(me, other):
+            # The original Q filters of search_candidates
+            if me.looking_for and me.looking_for != 'trans' and other.gender != me.looking_for:
+                return False
+            if me.gender and other.looking_for not in ('', None, 'trans', me.gender):
+                return False
+            if me.role == 'host' and other.role not in ('travel', 'either'):
+                return False
+            if me.role == 'travel' and other.role not in ('host', 'either'):
+                return False
+            return True
+
+        users = [
+            SessionUser.objects.create(session_id=f'{g}-{lf}-{r}', gender=g, looking_for=lf, role=r)
+            for g in ('man', 'female', '')
+            for lf in ('man', 'female', 'trans', '')
+            for r in ('host', 'travel', 'either')
+        ]
+        compat = np.array([u.compat for u in users])
+        for me in users:
+            mask = compatible_mask(me.gender, me.looking_for, me.role)
+            expected = {u.id for u in users if sees(me, u)}
+            in_sql = set(
+                SessionUser.objects.filter(compat__in=compat_values(mask)).values_list('id', flat=True)
+            )
+            in_numpy = {users[i].id for i in np.flatnonzero(compatible(compat, mask))}
+            self.assertEqual(in_sql, expected, me.session_id)
+            self.assertEqual(in_numpy, expected, me.session_id)
+
+    def test_profile_update_keeps_compat_in_sync(self):
+        me = self.make_user('me', 53.3498, -6.2603, gender='man', looking_for='female', role='host')
+        self.client.post('/api/mvp/profile/', data={'role': 'travel', 'gender': 'robot'}, HTTP_X_SESSION_ID='me')
+        me.refresh_from_db()
+        self.assertEqual((me.gender, me.role), ('man', 'travel'))
+        self.assertEqual(me.compat, compat_bit('man', 'female', 'travel'))
+
+    def test_search_answers_from_the_shared_geo_index(self):
+        me = self.make_user('me', 53.3498, -6.2603, gender='man', looking_for='female')
+        others = [self.make_user(f'o{i}', 53.3498 + i * 0.001, -6.2603) for i in range(8)]
+        self.make_user('far', 54.5, -6.2603)
+        self.make_user('man', 53.3499, -6.2603, gender='man')
+        Like.objects.create(from_user=me, to_user=others[0])
+        from_sql = self.search('me')
+
+        self.assertEqual(geo_index.build(), 11)
+        index = geo_index.reader()
+        self.assertEqual(list(index.geocell), sorted(index.geocell))
+        cache.clear()
+        with self.assertNumQueries(3):  # session lookup, cell counts, one PK-bounded query
+            from_index = self.search('me')
+        self.assertEqual(from_index, from_sql)
+        self.assertEqual([c['id'] for c in from_index], [o.id for o in others[1:]])
+
+        # A stale index is ignored.
+        with self.settings(MVP_GEO_INDEX_MAX_AGE=-1):
+            self.assertIsNone(geo_index.reader())
+
+    def test_geo_index_applies_only_the_changed_users(self):
+        me = self.make_user('me', 53.3498, -6.2603, gender='man', looking_for='female')
+        mover = self.make_user('mover', 53.3500, -6.2603)
+        gone = self.make_user('gone', 53.3501, -6.2603)
+        self.assertEqual(geo_index.build(), 3)
+
+        events = []
+        event_bus.subscribe(events.append)
+        self.addCleanup(event_bus._subscribers.remove, events.append)
+        self.client.post('/api/mvp/location/', data={'lat': 54.0, 'lon': -6.2603},
+                         content_type='application/json', HTTP_X_SESSION_ID='mover')
+        with self.captureOnCommitCallbacks(execute=True):
+            presence.flush()
+        self.assertIn({'kind': 'location', 'users': [mover.id]}, events)
+        SessionUser.objects.filter(id=gone.id).update(primary_photo=None)
+
+        with self.assertNumQueries(1):  # the changed rows by primary key, not a full scan
+            self.assertEqual(geo_index.apply_changes({mover.id, gone.id}), 2)
+        index = geo_index.reader()
+        self.assertEqual(sorted(index.id.tolist()), [me.id, mover.id])
+        self.assertEqual(index.lat[index.id == mover.id].tolist(), [54.0])
+        self.assertEqual(list(index.geocell), sorted(index.geocell))
+
+    @override_settings(MVP_SEARCH_WINDOW=5)
+    def test_geo_index_search_skips_past_a_passed_top_of_the_ranking(self):
+        me = self.make_user('me', 53.3498, -6.2603, gender='man', looking_for='female')
+        others = [self.make_user(f'o{i}', 53.3499 + i * 0.001, -6.2603) for i in range(30)]
+        Pass.objects.bulk_create([Pass(from_user=me, to_user=o) for o in others[:10]])
+        from_sql = self.search('me')
+        self.assertEqual([c['id'] for c in from_sql], [o.id for o in others[10:15]])
+
+        geo_index.build()
+        cache.clear()
+        self.assertEqual(self.search('me'), from_sql)
+
+    def test_ranking_blends_distance_recency_role_and_photo(self):
+        me = self.make_user('me', 53.3498, -6.2603, gender='man', looking_for='female', role='host')
+        idle = self.make_user('idle', 53.3500, -6.2603, role='either')
+        fresh = self.make_user('fresh', 53.3600, -6.2603, role='either')
+        traveller = self.make_user('traveller', 53.3601, -6.2603, role='travel')  # just behind fresh
+        SessionUser.objects.filter(id=idle.id).update(last_active=timezone.now() - timezone.timedelta(days=2))
+        Photo.objects.filter(id=traveller.primary_photo_id).update(thumbnail='mvp/photos/t_thumb.jpg')
+
+        self.assertEqual([c['id'] for c in self.search('me')], [traveller.id, fresh.id, idle.id])
+        invalidate_windows(me.id)
+        with self.assertNumQueries(1):
+            self.search('me')  # ranking adds no queries (session cached, window rebuilt)
+
+        cache.clear()
+        with self.settings(MVP_RANKING={'weights': {'recency': 0, 'role': 0, 'photo': 0}}):
+            self.assertEqual([c['id'] for c in self.search('me')], [idle.id, fresh.id, traveller.id])
+
+    def test_top_k_matches_a_full_sort(self):
+        rng = np.random.default_rng(7)
+        n = 500
+        feats = ranking.features('host', 10, rng.uniform(0, 10, n), time.time() - rng.uniform(0, 1e5, n),
+                                 [compat_bit('female', 'man', r) for r in rng.choice(['travel', 'either'], n)],
+                                 rng.integers(0, 2, n))
+        scores = ranking.blended_score(feats, ranking.ranking_config())
+        self.assertEqual(ranking.top_k(feats, 20), np.argsort(-scores, kind='stable')[:20].tolist())
+
+    @override_settings(MVP_DENSITY_TARGET=3, MVP_SEARCH_MAX_RADIUS=100)
+    def test_sparse_area_widens_radius_and_backs_off(self):
+        me = self.make_user('me', 53.3498, -6.2603, gender='man', looking_for='female')
+        # ~35 km north: outside the 10 km radius, inside 40 km
+        distant = [self.make_user(f'd{i}', 53.67 + i * 0.001, -6.2603) for i in range(3)]
+        res = self.client.get('/api/mvp/search/', HTTP_X_SESSION_ID='me').json()
+        self.assertEqual(res['radius_km'], 40)
+        self.assertEqual({c['id'] for c in res['candidates']}, {d.id for d in distant})
+        self.assertEqual(res['retry_after'], 5)  # 4 active people, target 3
+
+        invalidate_windows(me.id)
+        with self.assertNumQueries(1):  # cell counts come from the cache
+            self.search('me')
+
+        cache.clear()
+        SessionUser.objects.update(last_active=timezone.now() - timezone.timedelta(hours=1))
+        res = self.client.get('/api/mvp/search/', HTTP_X_SESSION_ID='me').json()
+        self.assertEqual(res['retry_after'], 300)  # nobody active nearby
+
+    @override_settings(MVP_DENSITY_TARGET=3, MVP_SEARCH_MAX_RADIUS=100)
+    def test_huge_radius_is_capped(self):
+        me = self.make_user('me', 53.3498, -6.2603, gender='man', looking_for='female')
+        self.client.post('/api/mvp/profile/', data={'radius': 20000}, HTTP_X_SESSION_ID='me')
+        me.refresh_from_db()
+        self.assertEqual(me.radius, 100)
+
+        SessionUser.objects.filter(id=me.id).update(radius=20000)  # saved before the cap
+        cache.clear()
+        started = time.monotonic()
+        with self.assertNumQueries(3):  # session, one grouped count over the spans, candidates
+            res = self.client.get('/api/mvp/search/', HTTP_X_SESSION_ID='me').json()
+        self.assertLess(time.monotonic() - started, 2)
+        self.assertEqual((res['radius_km'], res['candidates']), (100, []))
+
+    def test_passed_candidates_are_hidden_until_the_pass_expires(self):
+        me = self.make_user('me', 53.3498, -6.2603, gender='man', looking_for='female')
+        skipped = self.make_user('skipped', 53.3500, -6.2600)
+        kept = self.make_user('kept', 53.3501, -6.2601)
+        self.client.post('/api/mvp/swipes/', data={'swipes': [{'user_id': skipped.id, 'action': 'pass'}]},
+                         content_type='application/json', HTTP_X_SESSION_ID='me')
+        self.assertEqual([c['id'] for c in self.search('me')], [kept.id])
+
+        Pass.objects.filter(from_user=me).update(created_at=timezone.now() - timezone.timedelta(days=8))
+        invalidate_windows(me.id)
+        self.assertEqual({c['id'] for c in self.search('me')}, {kept.id, skipped.id})
+        self.assertEqual(prune_passes(), 1)
+        self.assertFalse(Pass.objects.exists())
+
+    def test_fresh_searches_reuse_the_window_until_a_swipe(self):
+        me = self.make_user('me', 53.3498, -6.2603, gender='man', looking_for='female')
+        first = self.make_user('first', 53.3500, -6.2600)
+        second = self.make_user('second', 53.3501, -6.2601)
+        self.assertEqual({c['id'] for c in self.search('me')}, {first.id, second.id})
+        with self.assertNumQueries(0):  # session cached, window still fresh
+            self.search('me')
+
+        self.client.post('/api/mvp/swipes/', data={'swipes': [{'user_id': first.id, 'action': 'pass'}]},
+                         content_type='application/json', HTTP_X_SESSION_ID='me')
+        self.assertEqual([c['id'] for c in self.search('me')], [second.id])
+
+        with self.settings(MVP_SEARCH_RESULT_TTL=0):
+            with self.assertNumQueries(1):
+                self.search('me')
+
+    def test_concurrent_fresh_searches_build_once(self):
+        builds = []
+
+        def build():
+            builds.append(1)
+            time.sleep(0.3)
+            return [{'id': 1}], {'radius_km': 10}
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            results = list(pool.map(lambda _: fresh_window(42, build), range(4)))
+        self.assertEqual(len(builds), 1)
+        self.assertTrue(all(r[2] == {'radius_km': 10} for r in results))
+
+    def test_matchmaker_pins_proposals_to_the_top_of_both_feeds(self):
+        me = self.make_user('me', 53.3498, -6.2603, gender='man', looking_for='female', role='host')
+        him = self.make_user('him', 53.3600, -6.2603, gender='man', looking_for='female')
+        close = self.make_user('close', 53.3600, -6.2603)
+        further = self.make_user('further', 53.3768, -6.2603)
+        self.assertEqual([c['id'] for c in self.search('me')], [close.id, further.id])
+
+        # him and close share a spot, so me is paired with the next best
+        self.assertEqual(propose_matches(), 2)
+        self.assertEqual((proposal_for(me.id), proposal_for(further.id)), (further.id, me.id))
+        self.assertEqual(proposal_for(him.id), close.id)
+        self.assertEqual([c['id'] for c in self.search('me')], [further.id, close.id])
+        self.assertEqual(self.search('further')[0]['id'], me.id)
+
+        Block.objects.create(blocker=further, blocked=me)
+        self.assertEqual(propose_matches(), 1)
+        self.assertIsNone(proposal_for(me.id))
+
+    def test_matchmaker_pairs_across_a_geocell_boundary(self):
+        me = self.make_user('me', 53.2499, -6.2603, gender='man', looking_for='female')
+        her = self.make_user('her', 53.2501, -6.2603)
+        self.assertNotEqual(me.geocell, her.geocell)
+        self.assertEqual(propose_matches(), 1)
+        self.assertEqual(proposal_for(me.id), her.id)
+
+        # A rerun keeps the pair, so the paging window is left alone.
+        self.client.get('/api/mvp/search/', HTTP_X_SESSION_ID='me')
+        propose_matches()
+        with self.assertNumQueries(0):
+            self.search('me')
+
+
+@override_settings(MVP_STREAM_KEEPALIVE=5, MVP_STREAM_MAX_AGE=5)
+class MVPStreamTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        now = timezone.now()
+        self.me = SessionUser.objects.create(session_id='me', age_verified_at=now)
+        self.other = SessionUser.objects.create(session_id='other', age_verified_at=now)
+
+    def create_match(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            match = Match.objects.create(user1=self.me, user2=self.other, status='matched')
+            point_active_match(match)
+            event_bus.publish('match', self.me.id, self.other.id, match_id=match.id)
+        return match
+
+    async def test_stream_pushes_state_on_match(self):
+        ticket = (await self.async_client.post('/api/mvp/stream/ticket/', headers={'X-Session-ID': 'me'})).json()['ticket']
+        res = await self.async_client.get('/api/mvp/stream/', {'ticket': ticket})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res['Content-Type'], 'text/event-stream')
+        chunks = aiter(res.streaming_content)
+
+        self.assertTrue((await anext(chunks)).startswith(b'retry:'))
+        first = await anext(chunks)
+        self.assertEqual(json.loads(first[len(b'data: '):]), {'match_found': False})
+
+        match = await sync_to_async(self.create_match)()
+        pushed = json.loads((await asyncio.wait_for(anext(chunks), 2))[len(b'data: '):])
+        self.assertTrue(pushed['match_found'])
+        self.assertEqual(pushed['match_id'], match.id)
+
+    def test_bus_dispatches_after_commit(self):
+        received = []
+        event_bus.subscribe(received.append)
+        with self.captureOnCommitCallbacks(execute=True):
+            event_bus.publish('block', self.other.id, self.me.id)
+            self.assertEqual(received, [])
+        self.assertIn({'kind': 'block', 'users': sorted([self.me.id, self.other.id])}, received)
+
+    async def test_stream_requires_session(self):
+        res = await self.async_client.get('/api/mvp/stream/')
+        self.assertEqual(res.status_code, 401)
+
+    async def test_stream_url_takes_only_short_lived_tickets(self):
+        # The session credential itself is never accepted in the URL.
+        for credential in ('me', issue_token(self.me)):
+            res = await self.async_client.get('/api/mvp/stream/', {'session_id': credential, 'ticket': credential})
+            self.assertEqual(res.status_code, 401)
+
+        ticket = (await self.async_client.post('/api/mvp/stream/ticket/', headers={'X-Session-ID': 'me'})).json()['ticket']
+        with self.settings(MVP_STREAM_TICKET_MAX_AGE=-1):
+            res = await self.async_client.get('/api/mvp/stream/', {'ticket': ticket})
+        self.assertEqual(res.status_code, 401)
+
+
+class MVPSessionCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = SessionUser.objects.create(session_id='cached', age_verified_at=timezone.now())
+
+    def test_session_lookup_is_cached(self):
+        self.client.get('/api/mvp/poll/', HTTP_X_SESSION_ID='cached')
+        # Warm cache: only the match lookup hits the database.
+        with self.assertNumQueries(1):
+            res = self.client.get('/api/mvp/poll/', HTTP_X_SESSION_ID='cached')
+        self.assertEqual(res.json(), {'match_found': False})
+
+    def test_profile_update_invalidates_cache(self):
+        self.client.get('/api/mvp/poll/', HTTP_X_SESSION_ID='cached')
+        self.client.post('/api/mvp/profile/', data={'radius': '25'}, HTTP_X_SESSION_ID='cached')
+        self.assertEqual(load_session_user('cached').radius, 25)
+
+
+class MVPSessionTokenTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_init_issues_token_and_plain_ids_still_work(self):
+        data = self.client.post('/api/mvp/init/', HTTP_X_SESSION_ID='plain').json()
+        user = SessionUser.objects.get(session_id='plain')
+        self.assertEqual(read_token(data['token']), {'u': user.id, 'v': 0})
+
+        user.age_verified_at = timezone.now()
+        user.save()
+        res = self.client.get('/api/mvp/poll/', HTTP_X_SESSION_ID='plain')
+        self.assertEqual(res.status_code, 200)
+
+    def test_token_rejections_skip_the_database(self):
+        user = SessionUser.objects.create(session_id='tok')
+        token = issue_token(user)
+        with self.assertNumQueries(0):
+            res = self.client.get('/api/mvp/poll/', HTTP_X_SESSION_ID=token)
+        self.assertEqual(res.status_code, 403)
+        with self.assertNumQueries(0):
+            res = self.client.get('/api/mvp/poll/', HTTP_X_SESSION_ID=token[:-2] + 'xx')
+        self.assertEqual(res.status_code, 401)
+
+    def test_verify_age_reissues_token(self):
+        user = SessionUser.objects.create(session_id='tok')
+        res = self.client.post('/api/mvp/age/', data={'dob': '1990-01-01'}, content_type='application/json',
+                               HTTP_X_SESSION_ID=issue_token(user))
+        token = res.json()['token']
+        self.assertEqual(read_token(token)['v'], 1)
+        res = self.client.get('/api/mvp/poll/', HTTP_X_SESSION_ID=token)
+        self.assertEqual(res.json(), {'match_found': False})
+
+
+class MVPMatchSweeperTests(TestCase):
+    def setUp(self):
+        self.a = SessionUser.objects.create(session_id='a')
+        self.b = SessionUser.objects.create(session_id='b')
+        self.c = SessionUser.objects.create(session_id='c')
+
+    def test_sweeper_expires_only_overdue_active_matches(self):
+        past = timezone.now() - timezone.timedelta(minutes=1)
+        overdue = Match.objects.create(user1=self.a, user2=self.b, status='confirmed', expires_at=past)
+        cancelled = Match.objects.create(user1=self.a, user2=self.c, status='cancelled', expires_at=past)
+        live = Match.objects.create(user1=self.b, user2=self.c, status='matched')
+        point_active_match(live)
+        point_active_match(overdue)
+
+        received = []
+        event_bus.subscribe(received.append)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(expire_overdue_matches(batch_size=1), 1)
+
+        statuses = dict(Match.objects.values_list('id', 'status'))
+        self.assertEqual(statuses, {overdue.id: 'expired', cancelled.id: 'cancelled', live.id: 'matched'})
+        self.assertIn({'kind': 'expire', 'users': sorted([self.a.id, self.b.id]), 'match_id': overdue.id}, received)
+        pointers = dict(SessionUser.objects.values_list('id', 'active_match_id'))
+        self.assertEqual(pointers, {self.a.id: None, self.b.id: live.id, self.c.id: live.id})
+
+
+class MVPConfirmTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        now = timezone.now()
+        self.host = SessionUser.objects.create(session_id='host', role='host', age_verified_at=now)
+        self.guest = SessionUser.objects.create(session_id='guest', role='travel', age_verified_at=now)
+        self.match = Match.objects.create(user1=self.host, user2=self.guest, status='matched')
+        point_active_match(self.match)
+
+    def confirm(self, session_id, match_id=None):
+        return self.client.post('/api/mvp/confirm/', data={'match_id': match_id or self.match.id},
+                                content_type='application/json', HTTP_X_SESSION_ID=session_id)
+
+    def test_confirm_sets_only_own_flag_then_promotes(self):
+        res = self.confirm('host')
+        self.assertEqual(res.json(), {'status': 'ok', 'match_status': 'matched'})
+        self.match.refresh_from_db()
+        self.assertEqual((self.match.user1_confirmed, self.match.user2_confirmed), (True, False))
+
+        res = self.confirm('guest')
+        self.assertEqual(res.json(), {'status': 'ok', 'match_status': 'confirmed'})
+        self.match.refresh_from_db()
+        self.assertEqual((self.match.user1_confirmed, self.match.user2_confirmed), (True, True))
+
+    def test_confirm_freezes_host_guest_and_host_location(self):
+        SessionUser.objects.filter(id=self.host.id).update(lat=53.35, lon=-6.26)
+        self.confirm('host')
+        self.confirm('guest')
+        self.match.refresh_from_db()
+        self.assertEqual((self.match.host_id, self.match.guest_id), (self.host.id, self.guest.id))
+        self.assertEqual((self.match.host_lat, self.match.host_lon), (53.35, -6.26))
+
+        # Host edits role and moves mid-match: guests keep the frozen answer.
+        SessionUser.objects.filter(id=self.host.id).update(role='travel', lat=0.0, lon=0.0)
+        with self.assertNumQueries(1):
+            state = self.client.get('/api/mvp/poll/', HTTP_X_SESSION_ID='guest').json()
+        self.assertEqual(state['my_role'], 'guest')
+        self.assertEqual(state['location'], {'lat': 53.35, 'lon': -6.26})
+
+    def test_confirm_freezes_the_buffered_host_fix(self):
+        self.addCleanup(presence.flush)
+        SessionUser.objects.filter(id=self.host.id).update(lat=53.35, lon=-6.26)
+        self.client.post('/api/mvp/location/', data={'lat': 53.36, 'lon': -6.25},
+                         content_type='application/json', HTTP_X_SESSION_ID='host')
+        self.assertEqual(SessionUser.objects.get(id=self.host.id).lat, 53.35)  # not flushed yet
+        self.confirm('host')
+        self.confirm('guest')
+        self.match.refresh_from_db()
+        self.assertEqual((self.match.host_lat, self.match.host_lon), (53.36, -6.25))
+
+    def test_confirm_rejects_outsiders_expired_and_impossible_matches(self):
+        SessionUser.objects.create(session_id='stranger', age_verified_at=timezone.now())
+        self.assertEqual(self.confirm('stranger').status_code, 403)
+
+        Match.objects.filter(id=self.match.id).update(expires_at=timezone.now() - timezone.timedelta(seconds=1))
+        self.assertEqual(self.confirm('host').status_code, 410)
+        self.assertEqual(Match.objects.get(id=self.match.id).status, 'expired')
+
+        other = SessionUser.objects.create(session_id='other', role='travel', age_verified_at=timezone.now())
+        both_travel = Match.objects.create(user1=self.guest, user2=other, status='matched')
+        self.confirm('guest', both_travel.id)
+        self.assertEqual(self.confirm('other', both_travel.id).status_code, 409)
+        self.assertEqual(Match.objects.get(id=both_travel.id).status, 'cancelled')
+
+
+class MVPActiveMatchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        now = timezone.now()
+        self.a = SessionUser.objects.create(session_id='a', age_verified_at=now)
+        self.b = SessionUser.objects.create(session_id='b', age_verified_at=now)
+        self.c = SessionUser.objects.create(session_id='c', age_verified_at=now)
+
+    def post(self, path, session_id, **data):
+        return self.client.post(path, data=data, content_type='application/json', HTTP_X_SESSION_ID=session_id)
+
+    def pointers(self):
+        return dict(SessionUser.objects.values_list('session_id', 'active_match_id'))
+
+    def test_like_points_both_users_and_poll_is_one_query(self):
+        like(self.a.id, self.b.id)
+        match = like(self.b.id, self.a.id)
+        self.assertEqual(self.pointers(), {'a': match.id, 'b': match.id, 'c': None})
+
+        self.client.get('/api/mvp/poll/', HTTP_X_SESSION_ID='a')  # warm the session cache
+        with self.assertNumQueries(1):
+            state = self.client.get('/api/mvp/poll/', HTTP_X_SESSION_ID='a').json()
+        self.assertEqual(state['match_id'], match.id)
+
+    def test_cancel_falls_back_to_older_active_match(self):
+        older = Match.objects.create(user1=self.a, user2=self.c, status='matched')
+        point_active_match(older)
+        newer = Match.objects.create(user1=self.a, user2=self.b, status='matched')
+        point_active_match(newer)
+
+        self.post('/api/mvp/cancel/', 'a', match_id=newer.id)
+        self.assertEqual(self.pointers(), {'a': older.id, 'b': None, 'c': older.id})
+        self.assertEqual(self.client.get('/api/mvp/poll/', HTTP_X_SESSION_ID='a').json()['match_id'], older.id)
+
+    def test_block_and_lazy_expiry_clear_pointers(self):
+        blocked = Match.objects.create(user1=self.a, user2=self.b, status='matched')
+        point_active_match(blocked)
+        self.post('/api/mvp/block/', 'a', user_id=self.b.id)
+        self.assertEqual(self.pointers(), {'a': None, 'b': None, 'c': None})
+
+        past = timezone.now() - timezone.timedelta(minutes=1)
+        overdue = Match.objects.create(user1=self.a, user2=self.c, status='matched', expires_at=past)
+        point_active_match(overdue)
+        state = self.client.get('/api/mvp/poll/', HTTP_X_SESSION_ID='c').json()
+        self.assertEqual(state['status'], 'expired')
+        self.assertEqual(self.pointers(), {'a': None, 'b': None, 'c': None})
+        self.assertEqual(self.client.get('/api/mvp/poll/', HTTP_X_SESSION_ID='c').json(), {'match_found': False})
+
+
+class MVPSwipeBatchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        now = timezone.now()
+        self.me = SessionUser.objects.create(session_id='me', age_verified_at=now)
+        self.others = [SessionUser.objects.create(session_id=f'o{i}', age_verified_at=now) for i in range(6)]
+
+    def swipes(self, session_id, swipes):
+        return self.client.post('/api/mvp/swipes/', data={'swipes': swipes},
+                                content_type='application/json', HTTP_X_SESSION_ID=session_id)
+
+    def test_batch_records_likes_and_returns_every_mutual_match(self):
+        o = self.others
+        for other in o[:3]:
+            Like.objects.create(from_user=other, to_user=self.me)
+        existing = Match.objects.create(user1=o[2], user2=self.me, status='matched')
+        Block.objects.create(blocker=o[4], blocked=self.me)
+
+        batch = [{'user_id': other.id, 'action': 'like'} for other in o]
+        batch[1]['action'] = 'pass'
+        batch.append({'user_id': o[1].id, 'action': 'like'})  # last decision wins
+        batch.append({'user_id': o[5].id, 'action': 'pass'})
+        res = self.swipes('me', batch)
+        self.assertEqual(res.status_code, 200)
+
+        matches = {m['user_id']: m['match_id'] for m in res.json()['matches']}
+        self.assertEqual(set(matches), {o[0].id, o[1].id, o[2].id})
+        self.assertEqual(matches[o[2].id], existing.id)
+        self.assertEqual(Match.objects.count(), 3)
+        self.assertEqual(
+            set(Like.objects.filter(from_user=self.me).values_list('to_user_id', flat=True)),
+            {o[0].id, o[1].id, o[2].id, o[3].id},
+        )
+        new = Match.objects.get(id=matches[o[0].id])
+        self.assertEqual(SessionUser.objects.get(id=o[0].id).active_match_id, new.id)
+        self.assertGreater(new.expires_at, timezone.now())
+
+    def test_query_count_does_not_grow_with_batch_size(self):
+        for other in self.others:
+            Like.objects.create(from_user=other, to_user=self.me)
+
+        def run(targets):
+            with CaptureQueriesContext(connection) as ctx:
+                self.swipes('me', [{'user_id': t.id, 'action': 'like'} for t in targets])
+            return len(ctx.captured_queries)
+
+        run([])  # warm the session and block caches
+        self.assertEqual(run(self.others[:2]), run(self.others[2:]))
+
+    def test_rejects_bad_batches(self):
+        self.assertEqual(self.swipes('me', [{'user_id': self.others[0].id, 'action': 'maybe'}]).status_code, 400)
+        too_many = [{'user_id': self.others[0].id, 'action': 'pass'}] * 51
+        self.assertEqual(self.swipes('me', too_many).status_code, 400)
+        self.assertFalse(Like.objects.exists())
+
+
+class MVPConcurrentLikeTests(TransactionTestCase):
+    """Parallel mutual likes must yield exactly one match per pair."""
+
+    PAIRS = 8
+    ROUNDS = 3
+
+    def setUp(self):
+        cache.clear()
+        now = timezone.now()
+        self.pairs = [
+            (
+                SessionUser.objects.create(session_id=f'a{i}', age_verified_at=now),
+                SessionUser.objects.create(session_id=f'b{i}', age_verified_at=now),
+            )
+            for i in range(self.PAIRS)
+        ]
+
+    def like_with_retry(self, user_id, target_id):
+        try:
+            deadline = time.monotonic() + 10
+            while time.monotonic() < deadline:
+                try:
+                    return like(user_id, target_id)
+                except OperationalError:
+                    # SQLite's shared in-memory test database reports lock
+                    # contention instead of waiting; PostgreSQL blocks on the row lock.
+                    time.sleep(0.005)
+            raise AssertionError('like never acquired the database')
+        finally:
+            connection.close()
+
+    def test_parallel_mutual_likes_create_one_match(self):
+        jobs = []
+        for a, b in self.pairs:
+            for _ in range(self.ROUNDS):
+                jobs += [(a.id, b.id), (b.id, a.id)]
+        barrier = threading.Barrier(len(jobs))
+
+        def run(job):
+            barrier.wait()
+            return self.like_with_retry(*job)
+
+        with ThreadPoolExecutor(max_workers=len(jobs)) as pool:
+            results = list(pool.map(run, jobs))
+
+        self.assertEqual(Like.objects.count(), 2 * self.PAIRS)
+        self.assertEqual(Match.objects.count(), self.PAIRS)
+        for a, b in self.pairs:
+            match = active_match_between(a.id, b.id)
+            self.assertIsNotNone(match)
+        # Every call that saw the mutual like got the single surviving match.
+        match_ids = {m.id for m in Match.objects.all()}
+        self.assertTrue({r.id for r in results if r} <= match_ids)
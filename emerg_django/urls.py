@@ -11,7 +11,10 @@ from logic.mvp import (
     update_location,
     search_candidates,
     like_user,
+    swipe_batch,
     poll_status,
+    match_stream,
+    stream_ticket,
     confirm_match,
     cancel_match,
     block_user,
@@ -33,7 +36,10 @@ urlpatterns = [
     path("api/mvp/location/", update_location, name="mvp_location"),
     path("api/mvp/search/", search_candidates, name="mvp_search"),
     path("api/mvp/like/", like_user, name="mvp_like"),
+    path("api/mvp/swipes/", swipe_batch, name="mvp_swipes"),
     path("api/mvp/poll/", poll_status, name="mvp_poll"),
+    path("api/mvp/stream/", match_stream, name="mvp_stream"),
+    path("api/mvp/stream/ticket/", stream_ticket, name="mvp_stream_ticket"),
     path("api/mvp/confirm/", confirm_match, name="mvp_confirm"),
     path("api/mvp/cancel/", cancel_match, name="mvp_cancel"),
 ]
@@ -5,3 +5,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'emerg_django.settings')
 
 application = get_wsgi_application()
+
+# MVP background work (events, sweeps, presence flush, matchmaker): logic/background.py
+from logic.background import start_background_jobs  # noqa: E402
+
+start_background_jobs()
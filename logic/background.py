@@ -0,0 +1,28 @@
+# logic/background.py
+"""
+Per-process MVP background work, started once by each server entry point
+(emerg_django/wsgi.py and asgi.py):
+
+    cross-worker events   LISTEN thread on PostgreSQL, no-op on SQLite
+    match expiry          logic.match_sweeper
+    pass pruning          logic.passes
+    presence flush        logic.presence write-behind (also flushed at exit)
+    matchmaker            logic.matchmaker
+
+Management commands and tests don't call this; every job is also available
+on its own (see the mvp_* management commands).
+"""
+from logic import event_bus
+from logic.match_sweeper import start_sweeper
+from logic.matchmaker import start_matchmaker
+from logic.passes import start_pruner
+from logic.presence import start_flusher
+
+
+def start_background_jobs():
+    """Start every MVP background job in this process. Safe to call repeatedly."""
+    event_bus.start()
+    start_sweeper()
+    start_pruner()
+    start_flusher()
+    start_matchmaker()
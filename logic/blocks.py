@@ -0,0 +1,52 @@
+# logic/blocks.py
+"""
+Block-list lookups for the MVP.
+
+blocked_ids_for() answers "who can this user never see?" from one query and
+caches the set until a "block" event names the user. Searches should not
+ship that set back to SQL as an id__in literal; they use not_blocked_q(),
+a NOT EXISTS subquery answered from the Block indexes.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Exists, OuterRef, Q
+
+from emerg_database.models import Block
+from logic import event_bus
+
+
+def _key(user_id) -> str:
+    return f"mvp:blocks:{user_id}"
+
+
+def blocked_ids_for(user_id) -> set:
+    """Ids this user blocked or was blocked by."""
+    ids = cache.get(_key(user_id))
+    if ids is None:
+        pairs = Block.objects.filter(Q(blocker_id=user_id) | Q(blocked_id=user_id)).values_list(
+            "blocker_id", "blocked_id"
+        )
+        ids = {blocked if blocker == user_id else blocker for blocker, blocked in pairs}
+        cache.set(_key(user_id), ids, getattr(settings, "MVP_BLOCK_CACHE_TTL", 600))
+    return ids
+
+
+def not_blocked_q(user_id):
+    """Filter for SessionUser querysets: no block in either direction with user_id."""
+    return ~Exists(
+        Block.objects.filter(
+            Q(blocker_id=user_id, blocked_id=OuterRef("pk")) | Q(blocker_id=OuterRef("pk"), blocked_id=user_id)
+        )
+    )
+
+
+def invalidate_blocks(*user_ids):
+    cache.delete_many([_key(uid) for uid in user_ids])
+
+
+def _on_event(event):
+    if event.get("kind") == "block":
+        invalidate_blocks(*event.get("users", ()))
+
+
+event_bus.subscribe(_on_event)
@@ -0,0 +1,98 @@
+# logic/compat.py
+"""
+Compatibility classes for the MVP candidate filter.
+
+Every SessionUser falls into one of 27 classes: gender (man / female /
+unset) x what they look for (man / female / anyone) x role (host /
+travel / either). SessionUser.compat stores the user's class as a one-hot
+bit (1 << class), and COMPATIBLE[c] is the bitmask of every class a user of
+class c may be shown. Mutual preference filtering is then one bitwise
+predicate in NumPy:
+
+    compat & COMPATIBLE[my_class] != 0
+
+and, in SQL, an IN over the mask's set bits (compat_values()), which the
+index on SessionUser.compat can serve.
+
+The table is built from the original rules in _sees(), so the encoding
+never drifts from them. Adding a value to a choice list means adding it
+here too, and recomputing SessionUser.compat with a data migration.
+"""
+import numpy as np
+
+GENDERS = ("man", "female", "")
+LOOKING_FOR = ("man", "female", "any")  # "", None and "trans" mean no gender filter
+ROLES = ("host", "travel", "either")
+
+
+def _split(gender, looking_for, role):
+    g = gender if gender in ("man", "female") else ""
+    lf = looking_for if looking_for in ("man", "female") else "any"
+    r = role if role in ("host", "travel") else "either"
+    return g, lf, r
+
+
+def compat_class(gender, looking_for, role) -> int:
+    g, lf, r = _split(gender, looking_for, role)
+    return (GENDERS.index(g) * len(LOOKING_FOR) + LOOKING_FOR.index(lf)) * len(ROLES) + ROLES.index(r)
+
+
+def compat_bit(gender, looking_for, role) -> int:
+    """Value stored in SessionUser.compat."""
+    return 1 << compat_class(gender, looking_for, role)
+
+
+def _sees(me, other) -> bool:
+    """May a user of class me be shown a user of class other?"""
+    my_g, my_lf, my_r = me
+    other_g, other_lf, other_r = other
+    # Gender I'm looking for (anyone = no filter)
+    if my_lf != "any" and other_g != my_lf:
+        return False
+    # They must be looking for my gender (or anyone); no filter if mine is unset
+    if my_g and other_lf not in ("any", my_g):
+        return False
+    # Someone has to host
+    if my_r == "host" and other_r == "host":
+        return False
+    if my_r == "travel" and other_r == "travel":
+        return False
+    return True
+
+
+_CLASSES = [(g, lf, r) for g in GENDERS for lf in LOOKING_FOR for r in ROLES]
+COMPATIBLE = tuple(
+    sum(1 << j for j, other in enumerate(_CLASSES) if _sees(me, other)) for me in _CLASSES
+)
+
+
+def compatible_mask(gender, looking_for, role) -> int:
+    """Bitmask of the SessionUser.compat values this user may be shown."""
+    return COMPATIBLE[compat_class(gender, looking_for, role)]
+
+
+def compat_values(mask) -> list:
+    """The SessionUser.compat values in mask (its set bits), for compat__in."""
+    return [1 << c for c in range(len(_CLASSES)) if mask >> c & 1]
+
+
+def compatible(compat, mask) -> np.ndarray:
+    """Vectorised predicate over an array of SessionUser.compat values."""
+    return (np.asarray(compat, dtype=np.int64) & mask) != 0
+
+
+_BITS = np.left_shift(np.int64(1), np.arange(len(_CLASSES), dtype=np.int64))
+
+
+def compat_roles(compat) -> np.ndarray:
+    """ROLES index of each SessionUser.compat value in an array."""
+    classes = np.searchsorted(_BITS, np.asarray(compat, dtype=np.int64))
+    return classes % len(ROLES)
+
+
+_MASKS = np.asarray(COMPATIBLE, dtype=np.int64)
+
+
+def compatible_masks(compat) -> np.ndarray:
+    """compatible_mask() of each SessionUser.compat value in an array."""
+    return _MASKS[np.searchsorted(_BITS, np.asarray(compat, dtype=np.int64))]
@@ -0,0 +1,130 @@
+# logic/density.py
+"""
+Population-aware search radius and retry hints.
+
+Counts of searchable users (total, and active within
+MVP_DENSITY_ACTIVE_WINDOW) per non-empty geocell are fetched for the
+geocell_ranges() spans around a point with one grouped BETWEEN query, and
+each span's counts are cached for MVP_DENSITY_CACHE_TTL seconds. Empty
+cells are never listed, so the cost follows the people in the area, not
+its size. A cell only partly inside the circle contributes in proportion
+to its overlap (estimated from a 4x4 grid of sample points), so big cells
+at the rim don't stop the radius from growing. From these counts:
+
+  adaptive_radius()  doubles the user's radius, up to MVP_SEARCH_MAX_RADIUS,
+                     until the covered cells hold MVP_DENSITY_TARGET people;
+  retry_after()      tells clients with nothing left to swipe how long to
+                     wait: a few seconds where many people are active, up to
+                     MVP_RETRY_AFTER_MAX where nobody is.
+
+search_radius() turns a stored SessionUser.radius into the base radius
+every search starts from, capped at MVP_SEARCH_MAX_RADIUS.
+
+The counts are approximate (not filtered by preference or blocks). They
+decide how far to look, never who is shown.
+"""
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from emerg_database.models import SessionUser
+from logic.geo import GEOCELL_COLS, GEOCELL_DEG, geocell_ranges, haversine_km_many
+
+
+def search_radius(radius) -> int:
+    """Base search radius in km: unset means 10, "0 km" means walkable (1), capped at MVP_SEARCH_MAX_RADIUS."""
+    radius = int(radius or 10)
+    return min(max(radius, 1), getattr(settings, "MVP_SEARCH_MAX_RADIUS", 100))
+
+
+def _key(lo, hi) -> str:
+    return f"mvp:cell-pop:{lo}:{hi}"
+
+
+def cell_population(ranges) -> dict:
+    """{cell: (total, active)} for the non-empty cells in the geocell ranges, from the cache where possible."""
+    cached = cache.get_many([_key(lo, hi) for lo, hi in ranges])
+    counts = {}
+    missing = []
+    for lo, hi in ranges:
+        if _key(lo, hi) in cached:
+            counts.update(cached[_key(lo, hi)])
+        else:
+            missing.append((lo, hi))
+    if missing:
+        since = timezone.now() - timezone.timedelta(seconds=getattr(settings, "MVP_DENSITY_ACTIVE_WINDOW", 900))
+        spans = Q()
+        for lo, hi in missing:
+            spans |= Q(geocell__range=(lo, hi))
+        rows = (
+            SessionUser.objects.filter(spans, primary_photo__isnull=False)
+            .values("geocell")
+            .annotate(total=Count("id"), active=Count("id", filter=Q(last_active__gte=since)))
+        )
+        fresh = {span: {} for span in missing}
+        for row in rows:
+            for lo, hi in missing:
+                if lo <= row["geocell"] <= hi:
+                    fresh[(lo, hi)][row["geocell"]] = (row["total"], row["active"])
+                    break
+        cache.set_many({_key(lo, hi): value for (lo, hi), value in fresh.items()}, getattr(settings, "MVP_DENSITY_CACHE_TTL", 300))
+        for value in fresh.values():
+            counts.update(value)
+    return counts
+
+
+_SAMPLES = (np.arange(4) + 0.5) / 4
+
+
+def _overlap(lat, lon, radius_km, cells) -> np.ndarray:
+    """Approximate fraction of each cell lying within radius_km of (lat, lon)."""
+    cells = np.asarray(cells, dtype=np.int64)
+    south = (cells // GEOCELL_COLS) * GEOCELL_DEG - 90.0
+    west = (cells % GEOCELL_COLS) * GEOCELL_DEG - 180.0
+    lats = (south[:, None, None] + _SAMPLES[None, :, None] * GEOCELL_DEG).repeat(4, axis=2)
+    lons = (west[:, None, None] + _SAMPLES[None, None, :] * GEOCELL_DEG).repeat(4, axis=1)
+    inside = haversine_km_many(lat, lon, lats.ravel(), lons.ravel()) <= radius_km
+    return inside.reshape(len(cells), -1).mean(axis=1)
+
+
+def population(lat, lon, radius_km, counts=None):
+    """
+    Estimated (total, active) searchable users within radius_km. counts may
+    be cell_population() of a wider area around the same point.
+    """
+    ranges = geocell_ranges(lat, lon, radius_km)
+    if counts is None:
+        counts = cell_population(ranges)
+    cells = [cell for cell in counts if any(lo <= cell <= hi for lo, hi in ranges)]
+    if not cells:
+        return 0.0, 0.0
+    weights = _overlap(lat, lon, radius_km, cells)
+    totals = np.array([counts[cell][0] for cell in cells], dtype=np.float64)
+    actives = np.array([counts[cell][1] for cell in cells], dtype=np.float64)
+    return float(weights @ totals), float(weights @ actives)
+
+
+def adaptive_radius(lat, lon, radius_km):
+    """(radius_km, (total, active)) widened until the area is populated enough."""
+    target = getattr(settings, "MVP_DENSITY_TARGET", 20)
+    limit = getattr(settings, "MVP_SEARCH_MAX_RADIUS", 100)
+    radius_km = min(radius_km, limit)
+    counts = population(lat, lon, radius_km)
+    if counts[0] < target and radius_km < limit:
+        wide = cell_population(geocell_ranges(lat, lon, limit))  # every step's cells in one query
+        while counts[0] < target and radius_km < limit:
+            radius_km = min(radius_km * 2, limit)
+            counts = population(lat, lon, radius_km, wide)
+    return radius_km, counts
+
+
+def retry_after(active) -> int:
+    """Seconds a client with no candidates left should wait before searching again."""
+    low = getattr(settings, "MVP_RETRY_AFTER_MIN", 5)
+    high = getattr(settings, "MVP_RETRY_AFTER_MAX", 300)
+    if active <= 0:
+        return high
+    # Fewer active people nearby -> new candidates show up more slowly.
+    return int(min(high, max(low, low * getattr(settings, "MVP_DENSITY_TARGET", 20) / active)))
@@ -0,0 +1,122 @@
+# logic/event_bus.py
+"""
+Cross-worker event bus for MVP state changes.
+
+publish("match", user1_id, user2_id) tells every gunicorn worker that
+something about these users changed. On PostgreSQL events travel through
+NOTIFY on the MVP_EVENT_CHANNEL channel: the NOTIFY is part of the current
+transaction, so it is only delivered if the transaction commits, and every
+worker (including the publisher) receives it on its LISTEN thread. On
+SQLite (single process) events are dispatched in-process after commit.
+
+Subscribers are plain callables taking one event dict:
+    {"kind": "match", "users": [1, 2], ...extra}
+They run on the listener thread and must be quick and thread-safe.
+"""
+import json
+import logging
+import select
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+KINDS = ("match", "confirm", "cancel", "block", "expire")
+CHANNEL = getattr(settings, "MVP_EVENT_CHANNEL", "mvp_events")
+
+_subscribers = []
+_lock = threading.Lock()
+_listener = None
+
+
+def subscribe(callback):
+    """Register callback(event) for every published event in this process."""
+    with _lock:
+        if callback not in _subscribers:
+            _subscribers.append(callback)
+
+
+def _dispatch(event):
+    with _lock:
+        callbacks = list(_subscribers)
+    for callback in callbacks:
+        try:
+            callback(event)
+        except Exception:
+            logger.exception("event bus subscriber failed for %s", event.get("kind"))
+
+
+def _uses_postgres() -> bool:
+    return connection.vendor == "postgresql"
+
+
+def publish(kind, *user_ids, **extra):
+    """Publish an event about user_ids once the current transaction commits."""
+    event = {"kind": kind, "users": sorted({int(uid) for uid in user_ids if uid is not None}), **extra}
+    if _uses_postgres():
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_notify(%s, %s)", [CHANNEL, json.dumps(event)])
+    else:
+        transaction.on_commit(lambda: _dispatch(event))
+
+
+# -----------------------------
+# PostgreSQL listener
+# -----------------------------
+
+def _listen_forever():
+    import psycopg2
+    import psycopg2.extensions
+
+    db = settings.DATABASES["default"]
+    backoff = 1
+    while True:
+        conn = None
+        try:
+            conn = psycopg2.connect(
+                dbname=db["NAME"],
+                user=db["USER"],
+                password=db["PASSWORD"],
+                host=db["HOST"],
+                port=db["PORT"],
+                **db.get("OPTIONS", {}),
+            )
+            conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+            with conn.cursor() as cursor:
+                cursor.execute(f'LISTEN "{CHANNEL}"')
+            backoff = 1
+            while True:
+                if select.select([conn], [], [], 30) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    note = conn.notifies.pop(0)
+                    try:
+                        _dispatch(json.loads(note.payload))
+                    except ValueError:
+                        logger.warning("ignoring malformed event payload: %r", note.payload)
+        except Exception:
+            logger.exception("event bus listener lost its connection; retrying in %ss", backoff)
+            time.sleep(backoff)
+            backoff = min(backoff * 2, 30)
+        finally:
+            if conn is not None:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+
+
+def start():
+    """Start this process's LISTEN thread (PostgreSQL only). Safe to call repeatedly."""
+    global _listener
+    if not _uses_postgres():
+        return
+    with _lock:
+        if _listener is not None and _listener.is_alive():
+            return
+        _listener = threading.Thread(target=_listen_forever, name="mvp-event-bus", daemon=True)
+        _listener.start()
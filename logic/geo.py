@@ -0,0 +1,111 @@
+# logic/geo.py
+"""
+Geospatial helpers for the MVP candidate search.
+
+The world is split into a fixed lat/lon grid of GEOCELL_DEG degree cells.
+Each cell is numbered row-major (row * GEOCELL_COLS + col), so all the cells
+of one latitude row form a contiguous integer range. A radius search is then
+a handful of indexed BETWEEN ranges on SessionUser.geocell instead of a scan.
+
+NOTE: changing GEOCELL_DEG invalidates every stored geocell; a data migration
+must recompute them.
+"""
+import math
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+# Same sphere as haversine_km_many, so the box really encloses the circle
+# (the WGS84 equatorial 111.32 km/degree is larger and clipped the edge).
+KM_PER_DEG_LAT = math.pi * EARTH_RADIUS_KM / 180.0
+
+GEOCELL_DEG = 0.25
+GEOCELL_ROWS = int(round(180 / GEOCELL_DEG))
+GEOCELL_COLS = int(round(360 / GEOCELL_DEG))
+
+
+def _row(lat: float) -> int:
+    return min(GEOCELL_ROWS - 1, max(0, int(math.floor((lat + 90.0) / GEOCELL_DEG))))
+
+
+def _col(lon: float) -> int:
+    # Normalise to [-180, 180) first so 180 and -180 land in the same column.
+    lon = ((lon + 180.0) % 360.0) - 180.0
+    return int(math.floor((lon + 180.0) / GEOCELL_DEG)) % GEOCELL_COLS
+
+
+def geocell_for(lat, lon):
+    """Grid cell number for a point, or None when the point is unknown."""
+    if lat is None or lon is None:
+        return None
+    return _row(float(lat)) * GEOCELL_COLS + _col(float(lon))
+
+
+def bounding_box(lat, lon, radius_km):
+    """
+    Lat/lon box enclosing the circle of radius_km around (lat, lon).
+
+    Returns (lat_lo, lat_hi, lon_spans). lon_spans is a list of inclusive
+    (lo, hi) longitude ranges in [-180, 180]: two of them when the box
+    crosses the antimeridian, and None when the circle reaches a pole (or
+    is wide enough) that every longitude qualifies.
+    """
+    lat = float(lat)
+    lon = float(lon)
+    dlat = radius_km / KM_PER_DEG_LAT
+    lat_lo = max(-90.0, lat - dlat)
+    lat_hi = min(90.0, lat + dlat)
+
+    # Longitude degrees shrink with cos(lat); size the box for the latitude
+    # closest to a pole so it stays a superset of the circle.
+    widest = max(abs(lat_lo), abs(lat_hi))
+    if widest >= 90.0:
+        return lat_lo, lat_hi, None
+    dlon = radius_km / (KM_PER_DEG_LAT * math.cos(math.radians(widest)))
+    if dlon >= 180.0:
+        return lat_lo, lat_hi, None
+
+    lon = ((lon + 180.0) % 360.0) - 180.0
+    lon_lo = lon - dlon
+    lon_hi = lon + dlon
+    if lon_lo < -180.0:
+        return lat_lo, lat_hi, [(lon_lo + 360.0, 180.0), (-180.0, lon_hi)]
+    if lon_hi > 180.0:
+        return lat_lo, lat_hi, [(lon_lo, 180.0), (-180.0, lon_hi - 360.0)]
+    return lat_lo, lat_hi, [(lon_lo, lon_hi)]
+
+
+def geocell_ranges(lat, lon, radius_km):
+    """
+    Inclusive (lo, hi) geocell ranges covering every point within radius_km
+    of (lat, lon). Handles the antimeridian and polar caps.
+    """
+    lat_lo, lat_hi, lon_spans = bounding_box(lat, lon, radius_km)
+    row_lo = _row(lat_lo)
+    row_hi = _row(lat_hi)
+
+    if lon_spans is None:
+        return [(row_lo * GEOCELL_COLS, row_hi * GEOCELL_COLS + GEOCELL_COLS - 1)]
+
+    col_spans = [
+        (int(math.floor((lo + 180.0) / GEOCELL_DEG)), min(GEOCELL_COLS - 1, int(math.floor((hi + 180.0) / GEOCELL_DEG))))
+        for lo, hi in lon_spans
+    ]
+
+    ranges = []
+    for row in range(row_lo, row_hi + 1):
+        base = row * GEOCELL_COLS
+        for c_lo, c_hi in col_spans:
+            ranges.append((base + c_lo, base + c_hi))
+    return ranges
+
+
+def haversine_km_many(lat, lon, lats, lons) -> np.ndarray:
+    """Great-circle distances (km) from one point to arrays of points."""
+    phi1 = math.radians(float(lat))
+    lam1 = math.radians(float(lon))
+    phi2 = np.radians(np.asarray(lats, dtype=np.float64))
+    lam2 = np.radians(np.asarray(lons, dtype=np.float64))
+    a = np.sin((phi2 - phi1) / 2) ** 2 + math.cos(phi1) * np.cos(phi2) * np.sin((lam2 - lam1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
@@ -0,0 +1,244 @@
+# logic/geo_index.py
+"""
+Array-backed geo index shared by every gunicorn worker.
+
+One updater process (manage.py mvp_geo_index) snapshots the searchable
+SessionUsers into a struct-of-arrays file at MVP_GEO_INDEX_PATH (/dev/shm
+by default, i.e. RAM):
+
+    header   magic, version, count, built_at
+    id       int64[count]    sorted by geocell
+    geocell  int64[count]
+    lat      float64[count]
+    lon      float64[count]
+    active   float64[count]  last_active as a Unix timestamp
+    compat   int64[count]    SessionUser.compat (logic/compat.py)
+    photo    float64[count]  1.0 when the photo thumbnail exists (ranking input)
+
+Workers mmap the file read-only and use the arrays in place through
+np.frombuffer, so the pages are shared and nothing is copied per process.
+Because rows are sorted by geocell, each geocell range of a radius search
+(logic.geo.geocell_ranges) is a searchsorted slice.
+
+The updater writes a new file and os.replace()s it, so readers never see a
+half-written index. Readers notice the new inode and remap. A reader that
+has an older mapping keeps a consistent snapshot until then.
+
+Updates are incremental: "location" and "session" events name the users
+that moved or changed, and apply_changes() re-reads only those rows (by
+primary key) and merges them into the current arrays, so steady traffic
+costs the database O(changed users), not O(all users). A full snapshot
+(build()) runs at start, for events without ids, and every
+MVP_GEO_INDEX_REFRESH seconds; it also picks up the last_active drift of
+users who were only seen, not moved, which no event reports. reader() returns None when the file is
+missing or older than MVP_GEO_INDEX_MAX_AGE, and search falls back to SQL.
+"""
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+from django.db import close_old_connections
+
+from emerg_database.models import SessionUser
+from logic import event_bus
+from logic.geo import geocell_ranges, haversine_km_many
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"MVPGEO01"
+VERSION = 2
+_HEADER = struct.Struct("<8sIIqd")  # magic, version, reserved, count, built_at
+_COLUMNS = (
+    ("id", np.int64),
+    ("geocell", np.int64),
+    ("lat", np.float64),
+    ("lon", np.float64),
+    ("active", np.float64),
+    ("compat", np.int64),
+    ("photo", np.float64),
+)
+
+_lock = threading.Lock()
+_reader = None
+
+
+def index_path() -> str:
+    return getattr(settings, "MVP_GEO_INDEX_PATH", "/dev/shm/mvp_geo_index.bin")
+
+
+class GeoIndex:
+    """Read-only view of one index file."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as fh:
+            self.inode = os.fstat(fh.fileno()).st_ino
+            self._mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, count, built_at = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            self._mm.close()
+            raise ValueError(f"not a geo index file: {path}")
+        self.count = count
+        self.built_at = built_at
+        offset = _HEADER.size
+        for name, dtype in _COLUMNS:
+            setattr(self, name, np.frombuffer(self._mm, dtype=dtype, count=count, offset=offset))
+            offset += count * np.dtype(dtype).itemsize
+
+    def rows_near(self, lat, lon, radius_km) -> np.ndarray:
+        """Row positions in the geocells covering radius_km around (lat, lon)."""
+        parts = []
+        for lo, hi in geocell_ranges(lat, lon, radius_km):
+            start = np.searchsorted(self.geocell, lo, side="left")
+            end = np.searchsorted(self.geocell, hi, side="right")
+            if end > start:
+                parts.append(np.arange(start, end))
+        return np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+
+    def within(self, lat, lon, radius_km, mask, exclude_id=None):
+        """(rows, distances) of every compatible user within radius_km, unordered."""
+        rows = self.rows_near(lat, lon, radius_km)
+        keep = (self.compat[rows] & mask) != 0
+        if exclude_id is not None:
+            keep &= self.id[rows] != exclude_id
+        rows = rows[keep]
+        dists = haversine_km_many(lat, lon, self.lat[rows], self.lon[rows])
+        inside = dists <= radius_km
+        return rows[inside], dists[inside]
+
+
+def reader():
+    """This process's view of the current index, or None (cold start / stale)."""
+    global _reader
+    path = index_path()
+    try:
+        inode = os.stat(path).st_ino
+    except FileNotFoundError:
+        return None
+    with _lock:
+        if _reader is None or (_reader.path, _reader.inode) != (path, inode):
+            try:
+                _reader = GeoIndex(path)
+            except (OSError, ValueError, struct.error):
+                logger.exception("cannot open geo index %s", path)
+                _reader = None
+                return None
+        index = _reader
+    if time.time() - index.built_at > getattr(settings, "MVP_GEO_INDEX_MAX_AGE", 900):
+        return None
+    return index
+
+
+# -----------------------------
+# Updater
+# -----------------------------
+
+def _searchable():
+    return SessionUser.objects.filter(geocell__isnull=False, primary_photo__isnull=False).values_list(
+        "id", "geocell", "lat", "lon", "last_active", "compat", "primary_photo__thumbnail"
+    )
+
+
+def _columns(rows) -> list:
+    if rows:
+        ids, cells, lats, lons, actives, compats, thumbs = zip(*rows)
+        actives = [a.timestamp() for a in actives]
+        photos = [1.0 if thumb else 0.0 for thumb in thumbs]
+    else:
+        ids = cells = lats = lons = actives = compats = photos = ()
+    return [np.asarray(values, dtype=dtype) for values, (_, dtype) in
+            zip((ids, cells, lats, lons, actives, compats, photos), _COLUMNS)]
+
+
+def _write(path, columns) -> int:
+    order = np.argsort(columns[1], kind="stable")
+    count = len(order)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as fh:
+        fh.write(_HEADER.pack(MAGIC, VERSION, 0, count, time.time()))
+        for column in columns:
+            fh.write(column[order].tobytes())
+    os.replace(tmp, path)
+    return count
+
+
+def build(path=None) -> int:
+    """Snapshot searchable users into a new index file; returns the row count."""
+    path = path or index_path()
+    return _write(path, _columns(list(_searchable().iterator(chunk_size=5000))))
+
+
+def apply_changes(user_ids, path=None) -> int:
+    """
+    Rewrite the index with only user_ids re-read from the database (moved,
+    edited, or no longer searchable); falls back to build() without a
+    readable index. Returns the row count.
+    """
+    path = path or index_path()
+    try:
+        current = GeoIndex(path)
+    except (OSError, ValueError, struct.error):
+        return build(path)
+    changed = np.fromiter(user_ids, dtype=np.int64)
+    keep = ~np.isin(current.id, changed)
+    rows = []
+    for start in range(0, changed.size, 500):
+        rows.extend(_searchable().filter(id__in=changed[start:start + 500].tolist()))
+    fresh = _columns(rows)
+    columns = [np.concatenate([getattr(current, name)[keep], column]) for (name, _), column in zip(_COLUMNS, fresh)]
+    return _write(path, columns)
+
+
+class Updater:
+    """Applies moved / edited users to the index as events name them."""
+
+    EVENTS = ("location", "session")
+
+    def __init__(self):
+        self._dirty = threading.Event()
+        self._lock = threading.Lock()
+        self._changed = set()
+        self._full = False
+
+    def _on_event(self, event):
+        if event.get("kind") in self.EVENTS:
+            with self._lock:
+                if event.get("users"):
+                    self._changed.update(event["users"])
+                else:
+                    self._full = True  # no ids: can't tell who changed
+            self._dirty.set()
+
+    def run(self, interval=None, refresh=None):
+        interval = interval or getattr(settings, "MVP_GEO_INDEX_INTERVAL", 2)
+        refresh = refresh or getattr(settings, "MVP_GEO_INDEX_REFRESH", 300)
+        event_bus.subscribe(self._on_event)
+        event_bus.start()
+        last_full = 0.0
+        while True:
+            self._dirty.wait(timeout=max(0.0, last_full + refresh - time.monotonic()))
+            self._dirty.clear()
+            with self._lock:
+                changed, full = self._changed, self._full
+                self._changed, self._full = set(), False
+            full = full or time.monotonic() >= last_full + refresh
+            close_old_connections()
+            try:
+                if full:
+                    count = build()
+                    last_full = time.monotonic()
+                    logger.info("geo index rebuilt: %s users", count)
+                elif changed:
+                    count = apply_changes(changed)
+                    logger.info("geo index updated: %s changed, %s users", len(changed), count)
+            except Exception:
+                logger.exception("geo index update failed")
+                with self._lock:
+                    self._changed |= changed
+                    self._full |= full
+            time.sleep(interval)  # coalesce bursts of events into one update
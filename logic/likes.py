@@ -0,0 +1,131 @@
+# logic/likes.py
+"""
+Atomic like -> match.
+
+Two users liking each other at the same moment must produce exactly one
+match. like() runs in one transaction:
+
+  1. row-lock both SessionUser rows in id order (SELECT ... FOR UPDATE), so
+     concurrent likes within the same pair serialise without table locks;
+  2. upsert the Like (INSERT ... ON CONFLICT DO NOTHING);
+  3. if the reverse like exists, insert the Match. The partial unique
+     constraint on the unordered active pair (match_active_pair_uniq) turns
+     any duplicate into an IntegrityError and the existing match is returned;
+  4. point both users' active_match at the new match.
+
+apply_swipes() does the same for a whole batch of swipes: one lock
+statement, one bulk Like insert and one query for every mutual like. Passes
+in the batch are stored through logic.passes.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from emerg_database.models import Like, Match, SessionUser
+from logic.event_bus import publish
+from logic.matches import ACTIVE_STATUSES, point_active_match, repoint_active_match
+from logic.passes import record_passes
+
+
+def active_match_between(user_id, other_id):
+    return (
+        Match.objects.filter(
+            Q(user1_id=user_id, user2_id=other_id) | Q(user1_id=other_id, user2_id=user_id),
+            status__in=["matched", "confirmed"],
+        )
+        .order_by("-created_at")
+        .first()
+    )
+
+
+def like(user_id, target_id):
+    """
+    Record user_id liking target_id. Returns the active Match if the like is
+    mutual, else None. Raises SessionUser.DoesNotExist for an unknown target.
+    """
+    with transaction.atomic():
+        locked = list(
+            SessionUser.objects.select_for_update()
+            .filter(id__in=[user_id, target_id])
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+        if len(locked) != 2:
+            raise SessionUser.DoesNotExist("User not found")
+
+        Like.objects.bulk_create([Like(from_user_id=user_id, to_user_id=target_id)], ignore_conflicts=True)
+        if not Like.objects.filter(from_user_id=target_id, to_user_id=user_id).exists():
+            return None
+
+        try:
+            with transaction.atomic():
+                match = Match.objects.create(user1_id=user_id, user2_id=target_id, status="matched")
+        except IntegrityError:
+            return active_match_between(user_id, target_id)
+        point_active_match(match)
+        publish("match", user_id, target_id, match_id=match.id)
+        return match
+
+
+def apply_swipes(user_id, swipes):
+    """
+    Apply an ordered batch of (target_id, "like" | "pass") decisions for
+    user_id in one transaction; the last decision per target wins. Unknown
+    targets are skipped. Returns {target_id: Match} for every liked target
+    whose like is mutual, new matches included. Raises
+    SessionUser.DoesNotExist if user_id itself is gone.
+    """
+    decisions = {}
+    for target_id, action in swipes:
+        decisions.pop(target_id, None)
+        decisions[target_id] = action
+    decisions.pop(user_id, None)
+    liked = [t for t, action in decisions.items() if action == "like"]
+    passed = [t for t, action in decisions.items() if action == "pass"]
+    if not decisions:
+        return {}
+
+    with transaction.atomic():
+        # Same id-ordered row locks as like(), so the two paths serialise per pair.
+        locked = set(
+            SessionUser.objects.select_for_update()
+            .filter(id__in=[user_id, *decisions])
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+        if user_id not in locked:
+            raise SessionUser.DoesNotExist("User not found")
+        liked = [t for t in liked if t in locked]
+        if passed:
+            record_passes(user_id, [t for t in passed if t in locked])
+
+        Like.objects.bulk_create(
+            [Like(from_user_id=user_id, to_user_id=t) for t in liked], ignore_conflicts=True
+        )
+        mutual = set(
+            Like.objects.filter(from_user_id__in=liked, to_user_id=user_id).values_list("from_user_id", flat=True)
+        )
+        if not mutual:
+            return {}
+
+        matches = {}
+        for match in Match.objects.filter(
+            Q(user1_id=user_id, user2_id__in=mutual) | Q(user2_id=user_id, user1_id__in=mutual),
+            status__in=ACTIVE_STATUSES,
+        ):
+            matches[match.user2_id if match.user1_id == user_id else match.user1_id] = match
+
+        expires_at = timezone.now() + Match.TTL
+        created = Match.objects.bulk_create(
+            [
+                Match(user1_id=user_id, user2_id=t, status="matched", expires_at=expires_at)
+                for t in liked
+                if t in mutual and t not in matches
+            ]
+        )
+        if created:
+            repoint_active_match(user_id, *(m.user2_id for m in created))
+        for match in created:
+            matches[match.user2_id] = match
+            publish("match", user_id, match.user2_id, match_id=match.id)
+    return {t: matches[t] for t in liked if t in matches}
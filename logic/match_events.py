@@ -0,0 +1,74 @@
+# logic/match_events.py
+"""
+Wake-ups for clients waiting on match state changes.
+
+Views publish match/confirm/cancel/block/expire events on logic.event_bus.
+Streaming endpoints hold a subscription per connected user and only touch
+the database when one of those events names that user, so idle clients cost
+nothing between events. Events arrive from every worker via the bus.
+"""
+import asyncio
+import threading
+
+from logic import event_bus
+
+_lock = threading.Lock()
+_waiters = {}  # user_id -> set[Subscription]
+
+
+class Subscription:
+    """One waiting client. Use as a context manager from async code."""
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self._loop = None
+        self._event = None
+
+    def __enter__(self):
+        event_bus.start()
+        self._loop = asyncio.get_running_loop()
+        self._event = asyncio.Event()
+        with _lock:
+            _waiters.setdefault(self.user_id, set()).add(self)
+        return self
+
+    def __exit__(self, *exc):
+        with _lock:
+            subs = _waiters.get(self.user_id)
+            if subs:
+                subs.discard(self)
+                if not subs:
+                    del _waiters[self.user_id]
+        return False
+
+    def _wake(self):
+        self._loop.call_soon_threadsafe(self._event.set)
+
+    async def wait(self, timeout):
+        """True if woken by an event, False on timeout."""
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        self._event.clear()
+        return True
+
+
+def subscribe(user_id) -> Subscription:
+    return Subscription(user_id)
+
+
+def _on_event(event):
+    if event.get("kind") not in event_bus.KINDS:
+        return
+    with _lock:
+        targets = [sub for uid in event.get("users", ()) for sub in _waiters.get(uid, ())]
+    for sub in targets:
+        try:
+            sub._wake()
+        except RuntimeError:
+            # Event loop already closed; the connection is going away.
+            pass
+
+
+event_bus.subscribe(_on_event)
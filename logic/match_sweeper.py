@@ -0,0 +1,51 @@
+# logic/match_sweeper.py
+"""
+Batch expiry of overdue matches.
+
+Matches used to flip to "expired" only when someone polled or confirmed
+them. expire_overdue_matches() expires every active match past expires_at
+with bulk UPDATE ... RETURNING statements over the partial
+(status active, expires_at) index, re-points the affected users'
+active_match and publishes an "expire" event per row so streams and caches
+react. Run it from the mvp_expire_matches command or
+in-process via start_sweeper().
+"""
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from emerg_database.models import Match
+from logic import event_bus, periodic
+from logic.matches import repoint_active_match
+
+def expire_overdue_matches(batch_size=500) -> int:
+    """Expire all overdue active matches; returns how many were expired."""
+    table = connection.ops.quote_name(Match._meta.db_table)
+    sql = f"""
+        UPDATE {table} SET status = 'expired'
+        WHERE id IN (
+            SELECT id FROM {table}
+            WHERE status IN ('matched', 'confirmed') AND expires_at <= %s
+            LIMIT %s
+        )
+        AND status IN ('matched', 'confirmed')
+        RETURNING id, user1_id, user2_id
+    """
+    total = 0
+    while True:
+        now = connection.ops.adapt_datetimefield_value(timezone.now())
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(sql, [now, batch_size])
+                rows = cursor.fetchall()
+            repoint_active_match(*(uid for _, user1_id, user2_id in rows for uid in (user1_id, user2_id)))
+            for match_id, user1_id, user2_id in rows:
+                event_bus.publish("expire", user1_id, user2_id, match_id=match_id)
+        total += len(rows)
+        if len(rows) < batch_size:
+            return total
+
+
+def start_sweeper():
+    """Run the sweeper in this process every MVP_MATCH_SWEEP_INTERVAL seconds (0 = off)."""
+    periodic.every(getattr(settings, "MVP_MATCH_SWEEP_INTERVAL", 0), expire_overdue_matches, name="match-sweeper")
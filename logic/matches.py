@@ -0,0 +1,81 @@
+# logic/matches.py
+"""
+Race-free match state transitions.
+
+confirm() records one side's confirmation with a single conditional
+UPDATE ... RETURNING: it sets only the caller's flag and promotes the match
+to "confirmed" when the other flag is already set, all inside the database.
+There is no read-modify-write, so two confirms arriving on different
+gunicorn workers cannot overwrite each other.
+
+Each SessionUser also carries an active_match pointer so polling resolves
+the current match with one primary-key lookup instead of an OR query over
+user1/user2. point_active_match() sets it when a match is created;
+repoint_active_match() must run after any match leaves the active states
+(cancel, block, expiry) and falls back to the user's next active match via
+the partial match_active_user1_idx / match_active_user2_idx indexes.
+"""
+from django.db import connection
+from django.db.models import OuterRef, Q, Subquery
+from django.utils import timezone
+
+from emerg_database.models import Match, SessionUser
+
+ACTIVE_STATUSES = ("matched", "confirmed")
+
+
+def confirm(match_id, user_id):
+    """
+    Confirm match_id on behalf of user_id.
+
+    Returns (status, user1_id, user2_id, host_id) after the update, or None when the
+    match does not exist, is not the user's, is no longer active or is past
+    expires_at (callers inspect the row to report which).
+    """
+    table = connection.ops.quote_name(Match._meta.db_table)
+    sql = f"""
+        UPDATE {table} SET
+            user1_confirmed = CASE WHEN user1_id = %s THEN TRUE ELSE user1_confirmed END,
+            user2_confirmed = CASE WHEN user2_id = %s THEN TRUE ELSE user2_confirmed END,
+            status = CASE
+                WHEN (user1_confirmed OR user1_id = %s) AND (user2_confirmed OR user2_id = %s)
+                THEN 'confirmed' ELSE status END
+        WHERE id = %s
+          AND (user1_id = %s OR user2_id = %s)
+          AND status IN ('matched', 'confirmed')
+          AND expires_at > %s
+        RETURNING status, user1_id, user2_id, host_id
+    """
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [user_id, user_id, user_id, user_id, int(match_id), user_id, user_id, now])
+        return cursor.fetchone()
+
+
+def cancel_if_confirmed(match_id) -> bool:
+    """Conditional flip confirmed -> cancelled (e.g. no host available)."""
+    return Match.objects.filter(id=match_id, status="confirmed").update(status="cancelled") == 1
+
+
+def point_active_match(match: Match):
+    """Make match the active match of both of its users."""
+    SessionUser.objects.filter(id__in=[match.user1_id, match.user2_id]).update(active_match=match)
+
+
+def latest_active_match_id():
+    """Subquery: id of the newest active match of the outer SessionUser."""
+    return Subquery(
+        Match.objects.filter(
+            Q(user1=OuterRef("pk")) | Q(user2=OuterRef("pk")),
+            status__in=ACTIVE_STATUSES,
+        )
+        .order_by("-created_at")
+        .values("id")[:1]
+    )
+
+
+def repoint_active_match(*user_ids):
+    """Recompute active_match for user_ids after their matches changed state."""
+    ids = {int(uid) for uid in user_ids if uid is not None}
+    if ids:
+        SessionUser.objects.filter(id__in=ids).update(active_match=latest_active_match_id())
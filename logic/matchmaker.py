@@ -0,0 +1,169 @@
+# logic/matchmaker.py
+"""
+Background pairing of nearby active users.
+
+propose_matches() loads every searchable user seen in the last
+MVP_MATCHMAKER_ACTIVE_WINDOW seconds who has no active match (one query,
+at most MVP_MATCHMAKER_CELL_MAX per geocell), and looks for partners in the
+geocells around each of them, as search does. Two users may be paired
+when each is compatible with the other (logic/compat.py, which also rules
+out host+host and travel+travel, the pairs assign_host_guest cannot or
+should not place), they are inside both search radii, and neither blocked
+or passed the other or already liked each other. Each pair is scored with
+the search ranking from both sides (logic/ranking.py), and pairs are taken
+greedily best-first, so everybody gets at most one proposal. Last run's
+pairs are kept first while they stay eligible.
+
+A proposal is not a match: it is kept in the cache for MVP_MATCHMAKER_TTL
+seconds and search_candidates puts the proposed partner at the top of the
+user's next window (pin()), where the usual like/pass decides. Users whose
+partner changed get their window retired, so their next fresh search shows
+it while cursors into the current window keep working.
+
+Runs in-process via start_matchmaker() (one worker per interval when the
+cache is shared) or from `manage.py mvp_matchmaker`.
+"""
+import itertools
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from emerg_database.models import Block, Like, Pass, SessionUser
+from logic import periodic
+from logic.compat import ROLES, compat_roles, compatible_masks
+from logic.density import search_radius
+from logic.geo import geocell_ranges, haversine_km_many
+from logic.ranking import blended_score, features, ranking_config
+from logic.search_pages import retire_windows
+
+LOCK_KEY = "mvp:matchmaker-lock"
+
+
+def _key(user_id) -> str:
+    return f"mvp:proposal:{user_id}"
+
+
+def proposal_for(user_id):
+    """Id of the user proposed to user_id, or None."""
+    return cache.get(_key(user_id))
+
+
+def pin(best, ids, partner_id, k) -> list:
+    """best (positions into ids) with partner_id's position first, still at most k long."""
+    if partner_id is None:
+        return best
+    hits = np.flatnonzero(np.asarray(ids) == partner_id)
+    if not hits.size:
+        return best
+    pos = int(hits[0])
+    return [pos] + [p for p in best if p != pos][: k - 1]
+
+
+def _excluded_pairs(pool) -> set:
+    """Unordered id pairs within the pool queryset that must not be proposed."""
+    ids = pool.values("id")
+    pairs = set()
+    blocks = Block.objects.filter(blocker_id__in=ids, blocked_id__in=ids).values_list("blocker_id", "blocked_id")
+    pairs.update(frozenset(p) for p in blocks)
+    since = timezone.now() - timezone.timedelta(seconds=getattr(settings, "MVP_PASS_TTL", 7 * 24 * 3600))
+    passes = Pass.objects.filter(from_user_id__in=ids, to_user_id__in=ids, created_at__gte=since)
+    pairs.update(frozenset(p) for p in passes.values_list("from_user_id", "to_user_id"))
+    likes = set(Like.objects.filter(from_user_id__in=ids, to_user_id__in=ids).values_list("from_user_id", "to_user_id"))
+    pairs.update(frozenset(p) for p in likes if p[::-1] in likes)
+    return pairs
+
+
+def _pair(rows, config, excluded, previous) -> list:
+    """Greedy best-first pairs [(id, id)] among rows (sorted by geocell)."""
+    ids, cells, lats, lons, radii, actives, compats, thumbs = (np.asarray(col) for col in zip(*rows))
+    radii = np.array([search_radius(r) for r in radii], dtype=np.float64)  # same rules as search
+    actives = np.array([a.timestamp() for a in actives])
+    photos = np.array([1.0 if t else 0.0 for t in thumbs])
+    compats = compats.astype(np.int64)
+    masks = compatible_masks(compats)
+    roles = compat_roles(compats)
+
+    # Directed edges i -> j with how good j looks to i, exactly as i's search
+    # would rank it. Neighbours come from the geocells around i, like search,
+    # so users on either side of a cell boundary still meet.
+    src, dst, score = [], [], []
+    for i in range(len(ids)):
+        parts = [
+            np.arange(np.searchsorted(cells, lo, side="left"), np.searchsorted(cells, hi, side="right"))
+            for lo, hi in geocell_ranges(lats[i], lons[i], radii[i])
+        ]
+        near = np.concatenate(parts)
+        near = near[(near != i) & ((compats[near] & masks[i]) != 0) & ((compats[i] & masks[near]) != 0)]
+        dists = haversine_km_many(lats[i], lons[i], lats[near], lons[near])
+        inside = dists <= np.minimum(radii[i], radii[near])
+        near, dists = near[inside], dists[inside]
+        feats = features(ROLES[roles[i]], radii[i], dists, actives[near], compats[near], photos[near])
+        src.append(np.full(near.size, i))
+        dst.append(near)
+        score.append(blended_score(feats, config))
+    src, dst, score = np.concatenate(src), np.concatenate(dst), np.concatenate(score)
+
+    # Both conditions are symmetric, so every pair shows up once per side:
+    # sum the two sides into one weight per unordered pair.
+    left, right = np.minimum(src, dst), np.maximum(src, dst)
+    pair_keys, inverse = np.unique(left * len(ids) + right, return_inverse=True)
+    weight = np.bincount(inverse, weights=score)
+    left, right = pair_keys // len(ids), pair_keys % len(ids)
+
+    # Pairs proposed last time go first while still eligible, so proposals
+    # don't hop around as the recency term drifts between runs.
+    kept = np.array([previous.get(int(ids[i])) == int(ids[j]) for i, j in zip(left, right)], dtype=bool)
+    order = np.lexsort((-weight, ~kept))
+
+    taken, pairs = set(), []
+    for i, j in zip(left[order].tolist(), right[order].tolist()):
+        a, b = int(ids[i]), int(ids[j])
+        if a in taken or b in taken or frozenset((a, b)) in excluded:
+            continue
+        taken.update((a, b))
+        pairs.append((a, b))
+    return pairs
+
+
+def propose_matches() -> int:
+    """Recompute every proposal; returns how many pairs were proposed."""
+    since = timezone.now() - timezone.timedelta(seconds=getattr(settings, "MVP_MATCHMAKER_ACTIVE_WINDOW", 900))
+    pool = SessionUser.objects.filter(
+        last_active__gte=since, geocell__isnull=False, primary_photo__isnull=False, active_match__isnull=True
+    )
+    users = pool.order_by("geocell", "-last_active").values_list(
+        "id", "geocell", "lat", "lon", "radius", "last_active", "compat", "primary_photo__thumbnail"
+    )
+    cell_max = getattr(settings, "MVP_MATCHMAKER_CELL_MAX", 300)
+    rows = [
+        row
+        for _, cell_rows in itertools.groupby(users.iterator(chunk_size=5000), key=lambda row: row[1])
+        for row in itertools.islice(cell_rows, cell_max)  # most recently active first
+    ]
+    keys = [_key(row[0]) for row in rows]
+    previous = {int(k.rsplit(":", 1)[1]): v for k, v in cache.get_many(keys).items()}
+    proposals = {}
+    if len(rows) >= 2:
+        for a, b in _pair(rows, ranking_config(), _excluded_pairs(pool), previous):
+            proposals[a], proposals[b] = b, a
+
+    cache.set_many({_key(uid): partner for uid, partner in proposals.items()}, getattr(settings, "MVP_MATCHMAKER_TTL", 300))
+    cache.delete_many([_key(row[0]) for row in rows if row[0] not in proposals])
+    # Only a new partner retires the search window; cursors keep working.
+    changed = [row[0] for row in rows if previous.get(row[0]) != proposals.get(row[0])]
+    if changed:
+        retire_windows(*changed)
+    return len(proposals) // 2
+
+
+def _run_once():
+    # Several workers run this job; with a shared cache only one does the work per interval.
+    if cache.add(LOCK_KEY, 1, max(1, getattr(settings, "MVP_MATCHMAKER_INTERVAL", 0) - 1)):
+        propose_matches()
+
+
+def start_matchmaker():
+    """Recompute proposals in this process every MVP_MATCHMAKER_INTERVAL seconds (0 = off)."""
+    periodic.every(getattr(settings, "MVP_MATCHMAKER_INTERVAL", 0), _run_once, name="matchmaker")
@@ -1,35 +1,105 @@
 import uuid
 import json
 import math
-from datetime import date
+import asyncio
+from datetime import date, datetime
 
-from django.http import JsonResponse
+import numpy as np
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.shortcuts import render
 from django.utils import timezone
+from django.db import transaction
 from django.db.models import Q
 
 from emerg_database.models import SessionUser, Photo, Match, Like, Block, Report
+from logic import geo_index
+from logic.geo import bounding_box, geocell_ranges, haversine_km_many
+from logic.blocks import blocked_ids_for, invalidate_blocks, not_blocked_q
+from logic.compat import compat_values, compatible_mask
+from logic.density import adaptive_radius, retry_after, search_radius
+from logic.event_bus import publish
+from logic.likes import apply_swipes, like
+from logic.passes import not_passed_q
+from logic.matches import ACTIVE_STATUSES, cancel_if_confirmed, confirm, repoint_active_match
+from logic.match_events import subscribe
+from logic.matchmaker import pin, proposal_for
+from logic.photo_pipeline import schedule_derivatives
+from logic.presence import current_location, record_location, touch
+from logic.ranking import features, top_k
+from logic.search_pages import fresh_window, invalidate_windows, load_page, retire_windows
+from logic.session_cache import invalidate_session_user, load_session_user, load_session_user_by_id
+from logic.session_tokens import is_token, issue_stream_ticket, issue_token, read_stream_ticket, read_token
 
 
 # -----------------------------
 # Helpers
 # -----------------------------
 
-def get_session_user(request):
-    session_id = request.headers.get("X-Session-ID")
-    if not session_id:
-        return None
-    try:
-        return SessionUser.objects.get(session_id=session_id)
-    except SessionUser.DoesNotExist:
+def get_session_user(request, fresh=False, credential=None):
+    """
+    Resolve the X-Session-ID header (a plain session id or a signed session
+    token) to a SessionUser, at most once per request.
+
+    Reads come from the short-TTL session cache; endpoints that write to the
+    user row pass fresh=True so they never save a stale cached copy.
+    The resolved user is exposed as request.mvp_user.
+    """
+    user = getattr(request, "mvp_user", None)
+    if user is not None and not fresh:
+        return user
+
+    credential = credential or request.headers.get("X-Session-ID")
+    if not credential:
         return None
+    if is_token(credential):
+        claims = read_token(credential)
+        if not claims:
+            return None
+        if fresh:
+            user = SessionUser.objects.filter(id=claims["u"]).first()
+        else:
+            user = load_session_user_by_id(claims["u"])
+    elif fresh:
+        user = SessionUser.objects.filter(session_id=credential).first()
+    else:
+        user = load_session_user(credential)
+    request.mvp_user = user
+    return user
 
 
-def is_age_verified(user: SessionUser) -> bool:
+def is_age_verified(user) -> bool:
+    """Accepts a SessionUser or the claims of a signed session token."""
+    if isinstance(user, dict):
+        return bool(user.get("v"))
     return bool(getattr(user, "age_verified_at", None))
 
 
+def authenticate(request, require_age=True, fresh=False, credential=None):
+    """
+    (user, None) for an authorised MVP request, else (None, error response).
+    Bad, expired or unverified signed tokens are rejected without touching
+    the database.
+    """
+    credential = credential or request.headers.get("X-Session-ID")
+    if is_token(credential):
+        claims = read_token(credential)
+        if not claims:
+            return None, JsonResponse({"error": "Unauthorized"}, status=401)
+        if require_age and not is_age_verified(claims):
+            return None, JsonResponse({"error": "Age verification required"}, status=403)
+
+    user = get_session_user(request, fresh=fresh, credential=credential)
+    if not user:
+        return None, JsonResponse({"error": "Unauthorized"}, status=401)
+    if require_age and not is_age_verified(user):
+        return None, JsonResponse({"error": "Age verification required"}, status=403)
+    touch(user.id)
+    return user, None
+
+
 def haversine_km(lat1, lon1, lat2, lon2) -> float:
     """Great-circle distance between two points on Earth (km)."""
     r = 6371.0
@@ -48,6 +118,8 @@ def expire_match_if_needed(match: Match) -> Match:
     if timezone.now() > match.expires_at:
         match.status = "expired"
         match.save(update_fields=["status"])
+        repoint_active_match(match.user1_id, match.user2_id)
+        publish("expire", match.user1_id, match.user2_id, match_id=match.id)
     return match
 
 
@@ -82,10 +154,25 @@ def assign_host_guest(u1: SessionUser, u2: SessionUser):
     return (u1, u2) if u1.created_at <= u2.created_at else (u2, u1)
 
 
-def _blocked_ids_for(user: SessionUser):
-    ids1 = Block.objects.filter(blocker=user).values_list("blocked_id", flat=True)
-    ids2 = Block.objects.filter(blocked=user).values_list("blocker_id", flat=True)
-    return set(list(ids1) + list(ids2))
+def _photo_url(name) -> str:
+    """URL for a stored photo path without loading the Photo row."""
+    return Photo._meta.get_field("image").storage.url(name) if name else ""
+
+
+def _nearby_q(lat, lon, radius_km) -> Q:
+    """Coarse spatial cut for SQL: overlapping geocells and the lat/lon bounding box."""
+    cells = Q()
+    for lo, hi in geocell_ranges(lat, lon, radius_km):
+        cells |= Q(geocell__range=(lo, hi))
+
+    lat_lo, lat_hi, lon_spans = bounding_box(lat, lon, radius_km)
+    box = Q(lat__range=(lat_lo, lat_hi))
+    if lon_spans:
+        lons = Q()
+        for lo, hi in lon_spans:
+            lons |= Q(lon__range=(lo, hi))
+        box &= lons
+    return cells & box
 
 
 # -----------------------------
@@ -98,17 +185,21 @@ def init_session(request):
         return JsonResponse({"error": "Invalid method"}, status=405)
 
     session_id = request.headers.get("X-Session-ID")
-    if session_id:
+    user = None
+    if is_token(session_id):
+        user = get_session_user(request, fresh=True)
+    elif session_id:
         user, _ = SessionUser.objects.get_or_create(session_id=session_id)
-    else:
+    if user is None:
         session_id = str(uuid.uuid4())
         user = SessionUser.objects.create(session_id=session_id)
 
     return JsonResponse(
         {
             "session_id": user.session_id,
+            "token": issue_token(user),
             "age_verified": is_age_verified(user),
-            "has_photo": user.photos.exists(),
+            "has_photo": user.primary_photo_id is not None,
             "gender": user.gender,
             "looking_for": user.looking_for,
             "role": user.role,
@@ -123,9 +214,9 @@ def verify_age(request):
     if request.method != "POST":
         return JsonResponse({"error": "Invalid method"}, status=405)
 
-    user = get_session_user(request)
-    if not user:
-        return JsonResponse({"error": "Unauthorized"}, status=401)
+    user, denied = authenticate(request, require_age=False, fresh=True)
+    if denied:
+        return denied
 
     try:
         payload = json.loads(request.body or "{}")
@@ -142,7 +233,9 @@ def verify_age(request):
 
         user.age_verified_at = timezone.now()
         user.save(update_fields=["age_verified_at"])
-        return JsonResponse({"status": "ok"})
+        invalidate_session_user(user)
+        # Re-issue the token: the old one still says "not verified".
+        return JsonResponse({"status": "ok", "token": issue_token(user)})
     except Exception:
         return JsonResponse({"error": "Invalid data"}, status=400)
 
@@ -152,31 +245,34 @@ def update_profile(request):
     if request.method != "POST":
         return JsonResponse({"error": "Invalid method"}, status=405)
 
-    user = get_session_user(request)
-    if not user:
-        return JsonResponse({"error": "Unauthorized"}, status=401)
-    if not is_age_verified(user):
-        return JsonResponse({"error": "Age verification required"}, status=403)
+    user, denied = authenticate(request, fresh=True)
+    if denied:
+        return denied
 
     # Photo upload (multipart/form-data)
     if "photo" in request.FILES:
-        Photo.objects.create(user=user, image=request.FILES["photo"])
+        user.primary_photo = Photo.objects.create(user=user, image=request.FILES["photo"])
+        schedule_derivatives(user.primary_photo)
 
-    # Preferences
+    # Preferences (only known choices: search filters on logic/compat.py classes)
     data = request.POST
-    if "gender" in data:
+    if data.get("gender") in dict(SessionUser.GENDER_CHOICES):
         user.gender = data["gender"]
-    if "looking_for" in data:
+    if data.get("looking_for") in dict(SessionUser.LOOKING_FOR_CHOICES):
         user.looking_for = data["looking_for"]
-    if "role" in data:
+    if data.get("role") in dict(SessionUser.ROLE_CHOICES):
         user.role = data["role"]
     if "radius" in data:
         try:
-            user.radius = int(data["radius"])
+            # 0 stays "walkable"; anything wider than search ever looks is capped.
+            user.radius = min(max(int(data["radius"]), 0), settings.MVP_SEARCH_MAX_RADIUS)
         except ValueError:
             pass
 
-    user.save()
+    # last_active and the position are written by logic.presence, not here.
+    user.save(update_fields=["gender", "looking_for", "role", "radius", "primary_photo"])
+    invalidate_session_user(user)
+    invalidate_windows(user.id)
     return JsonResponse({"status": "ok"})
 
 
@@ -185,17 +281,15 @@ def update_location(request):
     if request.method != "POST":
         return JsonResponse({"error": "Invalid method"}, status=405)
 
-    user = get_session_user(request)
-    if not user:
-        return JsonResponse({"error": "Unauthorized"}, status=401)
-    if not is_age_verified(user):
-        return JsonResponse({"error": "Age verification required"}, status=403)
+    user, denied = authenticate(request)
+    if denied:
+        return denied
 
     try:
         data = json.loads(request.body or "{}")
-        user.lat = data.get("lat")
-        user.lon = data.get("lon")
-        user.save(update_fields=["lat", "lon"])
+        # Buffered: flushed to SessionUser in bulk by logic.presence.
+        if record_location(user, data["lat"], data["lon"]):
+            invalidate_windows(user.id)
         return JsonResponse({"status": "ok"})
     except Exception:
         return JsonResponse({"error": "Invalid data"}, status=400)
@@ -205,82 +299,124 @@ def search_candidates(request):
     if request.method != "GET":
         return JsonResponse({"error": "Invalid method"}, status=405)
 
-    user = get_session_user(request)
-    if not user:
-        return JsonResponse({"error": "Unauthorized"}, status=401)
-    if not is_age_verified(user):
-        return JsonResponse({"error": "Age verification required"}, status=403)
+    user, denied = authenticate(request)
+    if denied:
+        return denied
 
-    # Require location for distance-based search
+    # Require location for distance-based search (buffered fixes count)
+    user.lat, user.lon = current_location(user)
     if user.lat is None or user.lon is None:
         return JsonResponse({"error": "Location required"}, status=400)
 
+    # Next page of an earlier search: sliced from the cached window, no SQL.
+    cursor = request.GET.get("cursor")
+    if cursor:
+        page = load_page(user.id, cursor)
+        if page is not None:
+            results, next_cursor, meta = page
+            return JsonResponse({"candidates": results, "next_cursor": next_cursor, **meta})
+
+    # Fresh search: short-lived per-user result cache, concurrent duplicates coalesced.
+    results, next_cursor, meta = fresh_window(user.id, lambda: _rank_candidates(user))
+    return JsonResponse({"candidates": results, "next_cursor": next_cursor, **meta})
+
+
+def _rank_candidates(user: SessionUser):
+    """
+    (candidates, meta): up to MVP_SEARCH_WINDOW compatible candidates around
+    user, best first (logic/ranking.py), and the effective radius_km plus the
+    retry_after hint for clients that run out.
+    """
     # Base queryset
     candidates = SessionUser.objects.exclude(id=user.id)
 
-    # Safety: block list
-    blocked_ids = _blocked_ids_for(user)
-    if blocked_ids:
-        candidates = candidates.exclude(id__in=list(blocked_ids))
-
-    # Exclude users without photos
-    candidates = candidates.filter(photos__isnull=False).distinct()
+    # Safety: block list (NOT EXISTS, however long the list is)
+    candidates = candidates.filter(not_blocked_q(user.id))
 
-    # Mutual preference filtering (simple MVP)
-    if user.looking_for and user.looking_for != "trans":
-        candidates = candidates.filter(gender=user.looking_for)
+    # Exclude users without photos (local FK column, no join)
+    candidates = candidates.filter(primary_photo__isnull=False)
 
-    # Candidate must also be compatible with my gender (treat 'trans' as "no hard filter" for MVP)
-    if user.gender:
-        candidates = candidates.filter(
-            Q(looking_for="") | Q(looking_for__isnull=True) | Q(looking_for="trans") | Q(looking_for=user.gender)
-        )
-
-    # Role compatibility
-    if user.role == "host":
-        candidates = candidates.filter(role__in=["travel", "either"])
-    elif user.role == "travel":
-        candidates = candidates.filter(role__in=["host", "either"])
+    # Mutual gender/looking_for/role compatibility: the precomputed class bit
+    # must be one of the mask's classes (logic/compat.py); IN uses the index
+    mask = compatible_mask(user.gender, user.looking_for, user.role)
+    candidates = candidates.filter(compat__in=compat_values(mask))
 
     # Exclude already liked
     liked_ids = Like.objects.filter(from_user=user).values_list("to_user_id", flat=True)
     candidates = candidates.exclude(id__in=liked_ids)
 
-    # Distance filter: take recent active sample, then filter in Python
-    radius_km = int(user.radius or 10)
-    if radius_km <= 0:
-        # Interpret "0 km" as "very close" for usability (walkable)
-        radius_km = 1
-
-    sample = (
-        candidates.filter(lat__isnull=False, lon__isnull=False)
-        .order_by("-last_active")[:200]
-    )
-
-    ranked = []
-    for c in sample:
-        try:
-            d = haversine_km(user.lat, user.lon, c.lat, c.lon)
-            if d <= radius_km:
-                ranked.append((d, c))
-        except Exception:
-            continue
-
-    ranked.sort(key=lambda t: t[0])
-    ranked = ranked[:20]
-
-    results = []
-    for dist, c in ranked:
-        photo = c.photos.first()
-        results.append(
-            {
-                "id": c.id,
-                "photo_url": photo.image.url if photo else "",
-                "distance_km": round(dist, 1),
-            }
-        )
-
-    return JsonResponse({"candidates": results})
+    # ...and recently passed (NOT EXISTS on the unique pass index)
+    candidates = candidates.filter(not_passed_q(user.id))
+
+    # "0 km" means walkable; rows saved before the cap may hold huge radii
+    radius_km = search_radius(user.radius)
+    # Sparse area: look further out instead of coming back empty.
+    radius_km, (_, active) = adaptive_radius(user.lat, user.lon, radius_km)
+    meta = {"radius_km": radius_km, "retry_after": retry_after(active)}
+
+    window = settings.MVP_SEARCH_WINDOW
+    # Partner picked by the background matchmaker goes first when still eligible.
+    proposed = proposal_for(user.id)
+    photo_fields = ("primary_photo__image", "primary_photo__thumbnail", "primary_photo__webp")
+
+    index = geo_index.reader()
+    if index is not None:
+        # Shared geo index: geocell slices, compat bits, haversine and scoring
+        # run on the mmapped arrays; SQL only attaches photos and drops
+        # liked/passed/blocked ids among the best. The best 2 * window are
+        # over-fetched to leave room, doubling while too few survive (heavy
+        # swipers have passed the top of the ranking) until the rows run out.
+        rows, dists = index.within(user.lat, user.lon, radius_km, mask, exclude_id=user.id)
+        feats = features(user.role, radius_km, dists, index.active[rows], index.compat[rows], index.photo[rows])
+        k, photos = 2 * window, {}
+        while True:
+            best = pin(top_k(feats, k), index.id[rows], proposed, k)
+            ids = index.id[rows[best]].tolist()
+            unchecked = [uid for uid in ids if uid not in photos]
+            photos.update({uid: None for uid in unchecked})
+            photos.update(
+                {row[0]: row[1:] for row in candidates.filter(id__in=unchecked).values_list("id", *photo_fields)}
+            )
+            ranked = [
+                (uid, dist, photos[uid]) for uid, dist in zip(ids, dists[best].tolist()) if photos[uid] is not None
+            ][:window]
+            if len(ranked) >= window or k >= rows.size:
+                break
+            k *= 2
+    else:
+        # Cold start: SQL narrows to the geocells / bounding box around the
+        # user (both indexed), then exact haversine and scoring on the survivors.
+        nearby = candidates.filter(_nearby_q(user.lat, user.lon, radius_km))
+        rows = list(nearby.values_list("id", "lat", "lon", "last_active", "compat", *photo_fields))
+        ranked = []
+        if rows:
+            ids, lats, lons, actives, compats, _, thumbnails, _ = zip(*rows)
+            dists = haversine_km_many(user.lat, user.lon, lats, lons)
+            inside = np.flatnonzero(dists <= radius_km)
+            best = top_k(
+                features(
+                    user.role,
+                    radius_km,
+                    dists[inside],
+                    [actives[i].timestamp() for i in inside],
+                    [compats[i] for i in inside],
+                    [1.0 if thumbnails[i] else 0.0 for i in inside],
+                ),
+                window,
+            )
+            best = pin(best, np.asarray(ids)[inside], proposed, window)
+            ranked = [(ids[i], float(dists[i]), rows[i][5:]) for i in inside[best].tolist()]
+
+    results = [
+        {
+            "id": uid,
+            "photo_url": _photo_url(thumbnail or image),
+            "photo_webp_url": _photo_url(webp),
+            "distance_km": round(dist, 1),
+        }
+        for uid, dist, (image, thumbnail, webp) in ranked
+    ]
+    return results, meta
 
 
 @csrf_exempt
@@ -288,26 +424,23 @@ def like_user(request):
     if request.method != "POST":
         return JsonResponse({"error": "Invalid method"}, status=405)
 
-    user = get_session_user(request)
-    if not user:
-        return JsonResponse({"error": "Unauthorized"}, status=401)
-    if not is_age_verified(user):
-        return JsonResponse({"error": "Age verification required"}, status=403)
+    user, denied = authenticate(request)
+    if denied:
+        return denied
 
     try:
         data = json.loads(request.body or "{}")
-        target_id = (data.get("user_id") or data.get("target_id"))
-        target_user = SessionUser.objects.get(id=target_id)
+        target_id = int(data.get("user_id") or data.get("target_id"))
 
         # Blocked?
-        if target_user.id in _blocked_ids_for(user):
+        if target_id in blocked_ids_for(user.id):
             return JsonResponse({"error": "Not allowed"}, status=403)
 
-        Like.objects.get_or_create(from_user=user, to_user=target_user)
-
-        # Mutual like -> match
-        if Like.objects.filter(from_user=target_user, to_user=user).exists():
-            match = Match.objects.create(user1=user, user2=target_user, status="matched")
+        # Like + mutual-like check + match insert in one transaction
+        match = like(user.id, target_id)
+        # Next fresh search ranks again; cursors keep paging the unseen cards.
+        retire_windows(user.id)
+        if match:
             return JsonResponse({"match": True, "match_id": match.id})
 
         return JsonResponse({"match": False})
@@ -316,103 +449,240 @@ def like_user(request):
 
 
 @csrf_exempt
-def poll_status(request):
-    if request.method != "GET":
+def swipe_batch(request):
+    """Apply a batch of swipes: {"swipes": [{"user_id": 5, "action": "like" | "pass"}, ...]}."""
+    if request.method != "POST":
         return JsonResponse({"error": "Invalid method"}, status=405)
 
-    user = get_session_user(request)
-    if not user:
-        return JsonResponse({"error": "Unauthorized"}, status=401)
-    if not is_age_verified(user):
-        return JsonResponse({"error": "Age verification required"}, status=403)
+    user, denied = authenticate(request)
+    if denied:
+        return denied
+
+    try:
+        data = json.loads(request.body or "{}")
+        swipes = data.get("swipes") or []
+        if not isinstance(swipes, list):
+            return JsonResponse({"error": "Invalid data"}, status=400)
+        if len(swipes) > settings.MVP_SWIPE_BATCH_MAX:
+            return JsonResponse({"error": "Too many swipes"}, status=400)
+
+        decisions = []
+        for swipe in swipes:
+            action = swipe.get("action")
+            if action not in ("like", "pass"):
+                return JsonResponse({"error": "Invalid action"}, status=400)
+            decisions.append((int(swipe.get("user_id")), action))
+
+        # Blocked targets are dropped silently, like search never shows them.
+        blocked = blocked_ids_for(user.id)
+        matches = apply_swipes(user.id, [(t, action) for t, action in decisions if t not in blocked])
+        retire_windows(user.id)
+
+        return JsonResponse({
+            "status": "ok",
+            "matches": [{"user_id": t, "match_id": match.id} for t, match in matches.items()],
+        })
+    except Exception as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
 
-    match = (
-        Match.objects.filter(Q(user1=user) | Q(user2=user), status__in=["matched", "confirmed"])
-        .order_by("-created_at")
+def _match_state(user: SessionUser) -> dict:
+    """Current match payload for a user, as returned by poll_status and match_stream."""
+    # One PK lookup: the (fresh) active_match pointer plus both users' photos.
+    holder = (
+        SessionUser.objects.select_related("active_match__user1__primary_photo", "active_match__user2__primary_photo")
+        .filter(id=user.id)
         .first()
     )
+    match = holder.active_match if holder else None
 
-    if not match:
-        return JsonResponse({"match_found": False})
+    if not match or match.status not in ACTIVE_STATUSES:
+        return {"match_found": False}
 
     match = expire_match_if_needed(match)
 
     other_user = match.user2 if match.user1 == user else match.user1
-    photo = other_user.photos.first()
+    photo = other_user.primary_photo
 
     i_confirmed = match.user1_confirmed if match.user1 == user else match.user2_confirmed
     they_confirmed = match.user2_confirmed if match.user1 == user else match.user1_confirmed
 
-    host, guest = assign_host_guest(match.user1, match.user2)
-    my_role = "host" if host and user.id == host.id else ("guest" if guest and user.id == guest.id else None)
+    if match.host_id:
+        # Frozen at confirm time: role edits mid-match don't change the answer.
+        host_id, guest_id = match.host_id, match.guest_id
+        host_lat, host_lon = match.host_lat, match.host_lon
+    else:
+        # Not confirmed yet (or confirmed before roles were stored): provisional.
+        host, guest = assign_host_guest(match.user1, match.user2)
+        host_id, guest_id = (host.id, guest.id) if host and guest else (None, None)
+        host_lat, host_lon = (host.lat, host.lon) if host else (None, None)
+    my_role = "host" if user.id == host_id else ("guest" if user.id == guest_id else None)
 
     # Only reveal destination to the guest, and only after both confirmed.
     location = None
     maps_url = None
-    if match.status == "confirmed" and host and guest and my_role == "guest":
-        if host.lat is not None and host.lon is not None:
-            location = {"lat": host.lat, "lon": host.lon}
-            maps_url = f"https://www.google.com/maps/dir/?api=1&destination={host.lat},{host.lon}"
+    if match.status == "confirmed" and host_id and guest_id and my_role == "guest":
+        if host_lat is not None and host_lon is not None:
+            location = {"lat": host_lat, "lon": host_lon}
+            maps_url = f"https://www.google.com/maps/dir/?api=1&destination={host_lat},{host_lon}"
+
+    return {
+        "match_found": True,
+        "match_id": match.id,
+        "status": match.status,
+        "expires_at": match.expires_at.isoformat(),
+        "other_user": {
+            "photo_url": _photo_url(photo.thumbnail.name or photo.image.name) if photo else "",
+            "photo_webp_url": _photo_url(photo.webp.name) if photo else "",
+            "gender": other_user.gender,
+        },
+        "i_confirmed": i_confirmed,
+        "they_confirmed": they_confirmed,
+        "my_role": my_role,
+        "location": location,
+        "maps_url": maps_url,
+    }
 
-    return JsonResponse(
-        {
-            "match_found": True,
-            "match_id": match.id,
-            "status": match.status,
-            "expires_at": match.expires_at.isoformat(),
-            "other_user": {
-                "photo_url": photo.image.url if photo else "",
-                "gender": other_user.gender,
-            },
-            "i_confirmed": i_confirmed,
-            "they_confirmed": they_confirmed,
-            "my_role": my_role,
-            "location": location,
-            "maps_url": maps_url,
-        }
-    )
+
+@csrf_exempt
+def poll_status(request):
+    if request.method != "GET":
+        return JsonResponse({"error": "Invalid method"}, status=405)
+
+    user, denied = authenticate(request)
+    if denied:
+        return denied
+
+    return JsonResponse(_match_state(user))
 
 
 @csrf_exempt
-def confirm_match(request):
+def stream_ticket(request):
+    """Short-lived ?ticket= for /api/mvp/stream/ (EventSource cannot send X-Session-ID)."""
     if request.method != "POST":
         return JsonResponse({"error": "Invalid method"}, status=405)
 
-    user = get_session_user(request)
+    user, denied = authenticate(request)
+    if denied:
+        return denied
+
+    return JsonResponse({
+        "ticket": issue_stream_ticket(user),
+        "expires_in": getattr(settings, "MVP_STREAM_TICKET_MAX_AGE", 120),
+    })
+
+
+def _authenticate_stream(request):
+    """authenticate() for the stream: X-Session-ID header, or a stream ticket in the URL."""
+    ticket = request.GET.get("ticket")
+    if request.headers.get("X-Session-ID") or not ticket:
+        return authenticate(request)
+    claims = read_stream_ticket(ticket)
+    if not claims:
+        return None, JsonResponse({"error": "Unauthorized"}, status=401)
+    if not is_age_verified(claims):
+        return None, JsonResponse({"error": "Age verification required"}, status=403)
+    user = load_session_user_by_id(claims["u"])
     if not user:
-        return JsonResponse({"error": "Unauthorized"}, status=401)
-    if not is_age_verified(user):
-        return JsonResponse({"error": "Age verification required"}, status=403)
+        return None, JsonResponse({"error": "Unauthorized"}, status=401)
+    touch(user.id)
+    return user, None
+
+
+async def match_stream(request):
+    """
+    Server-Sent Events version of poll_status. Sends the match state on
+    connect and then only when a bus event names this user or the current
+    match reaches expires_at. Idle connections run no queries.
+    """
+    if request.method != "GET":
+        return JsonResponse({"error": "Invalid method"}, status=405)
+
+    user, denied = await sync_to_async(_authenticate_stream)(request)
+    if denied:
+        return denied
+
+    keepalive = getattr(settings, "MVP_STREAM_KEEPALIVE", 20)
+    max_age = getattr(settings, "MVP_STREAM_MAX_AGE", 300)
+
+    async def events():
+        loop = asyncio.get_running_loop()
+        closes_at = loop.time() + max_age
+        # Tell EventSource how long to wait before reconnecting (ms).
+        yield "retry: 3000\n\n"
+        with subscribe(user.id) as sub:
+            last = None
+            refresh = True
+            while loop.time() < closes_at:
+                if refresh:
+                    state = await sync_to_async(_match_state)(user)
+                    if state != last:
+                        yield f"data: {json.dumps(state)}\n\n"
+                        last = state
+
+                timeout = min(keepalive, max(0.0, closes_at - loop.time()))
+                expires_in = None
+                if state.get("status") in ("matched", "confirmed"):
+                    expires_at = datetime.fromisoformat(state["expires_at"])
+                    expires_in = (expires_at - timezone.now()).total_seconds() + 0.5
+                    timeout = max(0.0, min(timeout, expires_in))
+
+                refresh = await sub.wait(timeout)
+                if not refresh and expires_in is not None and expires_in <= keepalive:
+                    refresh = True
+                if not refresh:
+                    yield ": keepalive\n\n"
+
+    response = StreamingHttpResponse(events(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+@csrf_exempt
+def confirm_match(request):
+    if request.method != "POST":
+        return JsonResponse({"error": "Invalid method"}, status=405)
+
+    user, denied = authenticate(request)
+    if denied:
+        return denied
 
     try:
         data = json.loads(request.body or "{}")
         match_id = data.get("match_id")
-        match = Match.objects.get(id=match_id)
-
-        match = expire_match_if_needed(match)
-        if match.status == "expired":
-            return JsonResponse({"error": "Match expired"}, status=410)
-        if match.status == "cancelled":
-            return JsonResponse({"error": "Match cancelled"}, status=410)
 
-        if match.user1 == user:
-            match.user1_confirmed = True
-        elif match.user2 == user:
-            match.user2_confirmed = True
-        else:
-            return JsonResponse({"error": "Not your match"}, status=403)
-
-        # When both confirmed, ensure we can assign host/guest.
-        if match.user1_confirmed and match.user2_confirmed:
-            host, guest = assign_host_guest(match.user1, match.user2)
-            if not host or not guest:
-                match.status = "cancelled"
-                match.save(update_fields=["status", "user1_confirmed", "user2_confirmed"])
-                return JsonResponse({"error": "No host available (both chose travel)."}, status=409)
-            match.status = "confirmed"
-
-        match.save()
-        return JsonResponse({"status": "ok", "match_status": match.status})
+        with transaction.atomic():
+            row = confirm(match_id, user.id)
+            if row is None:
+                # Nothing updated: work out why from the row itself.
+                match = Match.objects.get(id=match_id)
+                if user.id not in (match.user1_id, match.user2_id):
+                    return JsonResponse({"error": "Not your match"}, status=403)
+                match = expire_match_if_needed(match)
+                if match.status == "cancelled":
+                    return JsonResponse({"error": "Match cancelled"}, status=410)
+                return JsonResponse({"error": "Match expired"}, status=410)
+
+            status, user1_id, user2_id, host_id = row
+            # When both confirmed, ensure we can assign host/guest, and freeze
+            # the assignment plus the host's location on the match.
+            if status == "confirmed" and host_id is None:
+                users = SessionUser.objects.in_bulk([user1_id, user2_id])
+                host, guest = assign_host_guest(users[user1_id], users[user2_id])
+                if not host or not guest:
+                    cancel_if_confirmed(match_id)
+                    repoint_active_match(user1_id, user2_id)
+                    publish("cancel", user1_id, user2_id, match_id=int(match_id))
+                    return JsonResponse({"error": "No host available (both chose travel)."}, status=409)
+                # Buffered GPS fix if there is one: the row lags by up to a flush.
+                host_lat, host_lon = current_location(host)
+                Match.objects.filter(id=match_id, host__isnull=True).update(
+                    host=host, guest=guest, host_lat=host_lat, host_lon=host_lon
+                )
+
+            publish("confirm", user1_id, user2_id, match_id=int(match_id))
+        return JsonResponse({"status": "ok", "match_status": status})
     except Exception:
         return JsonResponse({"error": "Invalid data"}, status=400)
 
@@ -422,9 +692,9 @@ def cancel_match(request):
     if request.method != "POST":
         return JsonResponse({"error": "Invalid method"}, status=405)
 
-    user = get_session_user(request)
-    if not user:
-        return JsonResponse({"error": "Unauthorized"}, status=401)
+    user, denied = authenticate(request, require_age=False)
+    if denied:
+        return denied
 
     try:
         data = json.loads(request.body or "{}")
@@ -434,6 +704,8 @@ def cancel_match(request):
         if match.user1 == user or match.user2 == user:
             match.status = "cancelled"
             match.save(update_fields=["status"])
+            repoint_active_match(match.user1_id, match.user2_id)
+            publish("cancel", match.user1_id, match.user2_id, match_id=match.id)
             return JsonResponse({"status": "ok"})
         return JsonResponse({"error": "Not your match"}, status=403)
     except Exception:
@@ -445,11 +717,9 @@ def block_user(request):
     if request.method != "POST":
         return JsonResponse({"error": "Invalid method"}, status=405)
 
-    user = get_session_user(request)
-    if not user:
-        return JsonResponse({"error": "Unauthorized"}, status=401)
-    if not is_age_verified(user):
-        return JsonResponse({"error": "Age verification required"}, status=403)
+    user, denied = authenticate(request)
+    if denied:
+        return denied
 
     try:
         data = json.loads(request.body or "{}")
@@ -458,12 +728,16 @@ def block_user(request):
         target = SessionUser.objects.get(id=target_id)
 
         Block.objects.get_or_create(blocker=user, blocked=target, defaults={"reason": reason})
+        invalidate_blocks(user.id, target.id)
+        invalidate_windows(user.id, target.id)
 
         # Safety: cancel any active match between them
         Match.objects.filter(
             Q(user1=user, user2=target) | Q(user1=target, user2=user),
             status__in=["matched", "confirmed"],
         ).update(status="cancelled")
+        repoint_active_match(user.id, target.id)
+        publish("block", user.id, target.id)
 
         return JsonResponse({"status": "ok"})
     except Exception:
@@ -475,11 +749,9 @@ def report_user(request):
     if request.method != "POST":
         return JsonResponse({"error": "Invalid method"}, status=405)
 
-    user = get_session_user(request)
-    if not user:
-        return JsonResponse({"error": "Unauthorized"}, status=401)
-    if not is_age_verified(user):
-        return JsonResponse({"error": "Age verification required"}, status=403)
+    user, denied = authenticate(request)
+    if denied:
+        return denied
 
     try:
         data = json.loads(request.body or "{}")
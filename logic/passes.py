@@ -0,0 +1,52 @@
+# logic/passes.py
+"""
+Recorded "pass" decisions.
+
+A pass hides a candidate from search_candidates for MVP_PASS_TTL seconds,
+after which they may be shown again. Passes live in one narrow table keyed
+by the unique (from_user, to_user) index: search excludes them with a
+NOT EXISTS probe per candidate row, so the cost does not grow with how many
+profiles the user has skipped. Passing someone again refreshes the TTL.
+Expired rows are deleted in batches by prune_passes().
+"""
+from django.conf import settings
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from emerg_database.models import Pass
+from logic import periodic
+
+
+def _cutoff():
+    return timezone.now() - timezone.timedelta(seconds=getattr(settings, "MVP_PASS_TTL", 7 * 24 * 3600))
+
+
+def record_passes(user_id, target_ids):
+    """Store (or refresh) user_id's passes on target_ids. Unknown ids must be filtered out first."""
+    now = timezone.now()
+    Pass.objects.bulk_create(
+        [Pass(from_user_id=user_id, to_user_id=t, created_at=now) for t in target_ids],
+        update_conflicts=True,
+        unique_fields=["from_user", "to_user"],
+        update_fields=["created_at"],
+    )
+
+
+def not_passed_q(user_id):
+    """Filter for SessionUser querysets: not passed by user_id within MVP_PASS_TTL."""
+    return ~Exists(Pass.objects.filter(from_user_id=user_id, to_user=OuterRef("pk"), created_at__gte=_cutoff()))
+
+
+def prune_passes(batch_size=1000) -> int:
+    """Delete expired passes; returns how many were deleted."""
+    total = 0
+    while True:
+        ids = list(Pass.objects.filter(created_at__lt=_cutoff()).values_list("id", flat=True)[:batch_size])
+        if not ids:
+            return total
+        total += Pass.objects.filter(id__in=ids).delete()[0]
+
+
+def start_pruner():
+    """Prune expired passes in this process every MVP_PASS_PRUNE_INTERVAL seconds (0 = off)."""
+    periodic.every(getattr(settings, "MVP_PASS_PRUNE_INTERVAL", 0), prune_passes, name="pass-pruner")
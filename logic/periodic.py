@@ -0,0 +1,43 @@
+# logic/periodic.py
+"""
+Minimal in-process periodic runner for MVP housekeeping.
+
+every(30, fn) runs fn on a daemon thread every 30 seconds in this worker.
+Jobs must be idempotent: with several gunicorn workers each one runs its
+own copy. Anything heavier belongs in a management command + cron.
+"""
+import logging
+import threading
+import time
+
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_jobs = {}  # name -> Thread
+
+
+def _loop(name, interval, fn):
+    while True:
+        time.sleep(interval)
+        close_old_connections()
+        try:
+            fn()
+        except Exception:
+            logger.exception("periodic job %s failed", name)
+        finally:
+            close_old_connections()
+
+
+def every(interval, fn, name=None):
+    """Start fn every interval seconds (once per process and name). interval <= 0 disables it."""
+    if not interval or interval <= 0:
+        return
+    name = name or fn.__name__
+    with _lock:
+        if name in _jobs and _jobs[name].is_alive():
+            return
+        thread = threading.Thread(target=_loop, args=(name, interval, fn), name=f"mvp-{name}", daemon=True)
+        _jobs[name] = thread
+        thread.start()
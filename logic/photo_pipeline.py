@@ -0,0 +1,74 @@
+# logic/photo_pipeline.py
+"""
+Thumbnail / WebP derivatives for MVP photos.
+
+update_profile stores the original upload and calls schedule_derivatives();
+the resize runs on a small background thread pool after the transaction
+commits, so the request never waits on Pillow. Derivatives are written next
+to the original:
+
+    mvp/photos/<session_id>/<name>.<ext>   original upload
+    mvp/photos/<session_id>/<name>_thumb.jpg
+    mvp/photos/<session_id>/<name>_thumb.webp
+
+Until they exist, clients keep getting the original URL.
+"""
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps
+
+from emerg_database.models import Photo
+
+logger = logging.getLogger(__name__)
+
+THUMB_SIZE = (480, 640)  # card aspect ratio (3:4)
+JPEG_QUALITY = 82
+WEBP_QUALITY = 78
+
+_executor = ThreadPoolExecutor(max_workers=getattr(settings, "MVP_PHOTO_WORKERS", 2), thread_name_prefix="mvp-photos")
+
+
+def _encode(image, fmt, quality) -> ContentFile:
+    buf = BytesIO()
+    image.save(buf, fmt, quality=quality, optimize=fmt == "JPEG")
+    return ContentFile(buf.getvalue())
+
+
+def generate_derivatives(photo: Photo):
+    """Create the JPEG thumbnail and WebP variant for photo and record them."""
+    storage = photo.image.storage
+    with storage.open(photo.image.name, "rb") as fh:
+        with Image.open(fh) as original:
+            image = ImageOps.exif_transpose(original).convert("RGB")
+    thumb = ImageOps.fit(image, THUMB_SIZE, Image.LANCZOS)
+
+    stem = os.path.splitext(photo.image.name)[0]
+    thumb_name = storage.save(f"{stem}_thumb.jpg", _encode(thumb, "JPEG", JPEG_QUALITY))
+    webp_name = storage.save(f"{stem}_thumb.webp", _encode(thumb, "WEBP", WEBP_QUALITY))
+    Photo.objects.filter(id=photo.id).update(thumbnail=thumb_name, webp=webp_name)
+
+
+def _run(photo_id):
+    close_old_connections()
+    try:
+        photo = Photo.objects.filter(id=photo_id).first()
+        if photo:
+            generate_derivatives(photo)
+    except Exception:
+        logger.exception("photo derivatives failed for photo %s", photo_id)
+    finally:
+        close_old_connections()
+
+
+def schedule_derivatives(photo: Photo):
+    """Generate derivatives off the request path once the upload is committed."""
+    if getattr(settings, "MVP_PHOTO_DERIVATIVES_ASYNC", True):
+        transaction.on_commit(lambda: _executor.submit(_run, photo.id))
+    else:
+        transaction.on_commit(lambda: generate_derivatives(photo))
@@ -0,0 +1,130 @@
+# logic/presence.py
+"""
+Write-behind buffer for presence (last_active) and GPS fixes.
+
+Requests no longer write SessionUser on every ping. authenticate() calls
+touch(), update_location() calls record_location(); both only update
+memory. Each worker flushes its buffer every MVP_PRESENCE_FLUSH_INTERVAL
+seconds with one bulk UPDATE for moved users and one UPDATE for the rest.
+
+Fixes closer than MVP_LOCATION_MIN_MOVE_M to the last known position are
+treated as presence only. The latest position is also kept in the shared
+cache, so current_location() is seconds fresh on every worker (search
+overlays it on the requesting user) and a flush never writes an older fix
+over a newer one taken by another worker. Up to one interval of presence
+can be lost if a worker dies; positions survive in the shared cache.
+Fixes that are not finite, in-range coordinates are refused up front, and a
+flush whose writes fail puts its batch back for the next one.
+"""
+import atexit
+import logging
+import math
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from emerg_database.models import SessionUser
+from logic import event_bus, periodic
+from logic.geo import geocell_for, haversine_km_many
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_moved = {}  # user_id -> (lat, lon, seen_at)
+_seen = set()  # user ids with presence only
+
+
+def _key(user_id) -> str:
+    return f"mvp:presence:{user_id}"
+
+
+def _valid(lat, lon) -> bool:
+    # json.loads accepts NaN and Infinity; they would poison the geocell and the flush.
+    return math.isfinite(lat) and math.isfinite(lon) and -90.0 <= lat <= 90.0 and -180.0 <= lon <= 180.0
+
+
+def current_location(user):
+    """(lat, lon) for user, preferring a buffered fix over the stored row."""
+    fix = cache.get(_key(user.id))
+    if fix is not None:
+        return fix[0], fix[1]
+    return user.lat, user.lon
+
+
+def touch(user_id):
+    """Mark user_id active now; written on the next flush."""
+    with _lock:
+        _seen.add(user_id)
+
+
+def record_location(user, lat, lon) -> bool:
+    """
+    Buffer a GPS fix for user. Returns True when it is a real move (at least
+    MVP_LOCATION_MIN_MOVE_M from the last known position), False when it
+    only counts as presence.
+    """
+    lat, lon = float(lat), float(lon)
+    if not _valid(lat, lon):
+        raise ValueError(f"invalid coordinates: {lat}, {lon}")
+    last_lat, last_lon = current_location(user)
+    if last_lat is not None and last_lon is not None:
+        moved_km = float(haversine_km_many(last_lat, last_lon, [lat], [lon])[0])
+        if moved_km * 1000 < getattr(settings, "MVP_LOCATION_MIN_MOVE_M", 50):
+            touch(user.id)
+            return False
+
+    now = timezone.now()
+    cache.set(_key(user.id), (lat, lon, now), getattr(settings, "MVP_PRESENCE_CACHE_TTL", 600))
+    with _lock:
+        _moved[user.id] = (lat, lon, now)
+        _seen.discard(user.id)
+    return True
+
+
+def flush() -> int:
+    """Write buffered fixes and presence to the database; returns rows touched."""
+    with _lock:
+        moved, seen = dict(_moved), set(_seen)
+        _moved.clear()
+        _seen.clear()
+    seen -= moved.keys()
+    try:
+        _write(moved, seen)
+    except Exception:
+        # Keep the batch for the next flush; fixes recorded meanwhile are newer and win.
+        with _lock:
+            for uid, fix in moved.items():
+                _moved.setdefault(uid, fix)
+            _seen.update(seen - _moved.keys())
+        raise
+    return len(moved) + len(seen)
+
+
+def _write(moved, seen):
+    if moved:
+        # Another worker may hold a newer fix for the same user.
+        shared = cache.get_many([_key(uid) for uid in moved])
+        rows = []
+        for uid, fix in moved.items():
+            newer = shared.get(_key(uid))
+            lat, lon, at = newer if newer is not None and newer[2] > fix[2] else fix
+            if not _valid(lat, lon):
+                logger.warning("dropping invalid buffered fix for user %s: %s, %s", uid, lat, lon)
+                continue
+            rows.append(SessionUser(id=uid, lat=lat, lon=lon, geocell=geocell_for(lat, lon), last_active=at))
+        SessionUser.objects.bulk_update(rows, ["lat", "lon", "geocell", "last_active"], batch_size=500)
+        # Ids in chunks: NOTIFY payloads are capped at 8000 bytes.
+        moved_ids = [row.id for row in rows]
+        for start in range(0, len(moved_ids), 500):
+            event_bus.publish("location", *moved_ids[start:start + 500])
+    if seen:
+        SessionUser.objects.filter(id__in=seen).update(last_active=timezone.now())
+
+
+def start_flusher():
+    """Flush this process's buffer every MVP_PRESENCE_FLUSH_INTERVAL seconds."""
+    periodic.every(getattr(settings, "MVP_PRESENCE_FLUSH_INTERVAL", 5), flush, name="presence-flush")
+    atexit.unregister(flush)  # once, however often this is called
+    atexit.register(flush)
@@ -0,0 +1,82 @@
+# logic/ranking.py
+"""
+Candidate ranking for search_candidates.
+
+Every candidate inside the radius gets one blended score built from columns
+search has already loaded (no extra queries):
+
+    distance   1 at my position, 0 at the edge of my radius
+    recency    halves every recency_half_life seconds since last_active
+    role       how well their host/travel role complements mine (ROLE_FIT)
+    photo      1 when the processed thumbnail exists, else 0
+
+The top k are picked with a bounded heap (heapq.nlargest), O(n log k).
+
+Deployments tune it with settings.MVP_RANKING:
+    {"scorer": "logic.ranking.blended_score",
+     "weights": {"distance": 1.0, "recency": 0.5, "role": 0.3, "photo": 0.2},
+     "recency_half_life": 3600}
+A custom scorer is any callable (features, config) -> array of scores.
+"""
+import heapq
+import time
+
+import numpy as np
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from logic.compat import ROLES, compat_roles
+
+DEFAULTS = {
+    "scorer": "logic.ranking.blended_score",
+    "weights": {"distance": 1.0, "recency": 0.5, "role": 0.3, "photo": 0.2},
+    "recency_half_life": 3600,
+}
+
+# Rows: my role, columns: their role (ROLES order: host, travel, either)
+ROLE_FIT = np.array(
+    [
+        [0.0, 1.0, 0.5],
+        [1.0, 0.0, 0.5],
+        [0.75, 0.75, 0.5],
+    ]
+)
+
+
+def ranking_config() -> dict:
+    custom = getattr(settings, "MVP_RANKING", None) or {}
+    return {**DEFAULTS, **custom, "weights": {**DEFAULTS["weights"], **custom.get("weights", {})}}
+
+
+def features(my_role, radius_km, distance_km, last_active, compat, photo) -> dict:
+    """Scoring inputs as arrays; last_active is Unix time, compat is SessionUser.compat."""
+    return {
+        "my_role": ROLES.index(my_role) if my_role in ROLES else ROLES.index("either"),
+        "radius_km": float(radius_km),
+        "now": time.time(),
+        "distance_km": np.asarray(distance_km, dtype=np.float64),
+        "last_active": np.asarray(last_active, dtype=np.float64),
+        "role": compat_roles(compat),
+        "photo": np.asarray(photo, dtype=np.float64),
+    }
+
+
+def blended_score(features, config) -> np.ndarray:
+    weights = config["weights"]
+    closeness = 1.0 - np.clip(features["distance_km"] / features["radius_km"], 0.0, 1.0)
+    idle = np.maximum(0.0, features["now"] - features["last_active"])
+    recency = np.exp2(-idle / config["recency_half_life"])
+    role_fit = ROLE_FIT[features["my_role"]][features["role"]]
+    return (
+        weights["distance"] * closeness
+        + weights["recency"] * recency
+        + weights["role"] * role_fit
+        + weights["photo"] * features["photo"]
+    )
+
+
+def top_k(features, k) -> list:
+    """Positions of the k best-scoring candidates, best first."""
+    config = ranking_config()
+    scores = import_string(config["scorer"])(features, config).tolist()
+    return heapq.nlargest(k, range(len(scores)), key=scores.__getitem__)
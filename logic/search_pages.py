@@ -0,0 +1,145 @@
+# logic/search_pages.py
+"""
+Server-side result windows for paginated candidate search.
+
+A fresh search ranks up to MVP_SEARCH_WINDOW candidates once, keeps the
+ranked list (plus response fields shared by all its pages, such as the
+effective radius) in the cache under the user's id for MVP_SEARCH_WINDOW_TTL
+seconds, and returns the first page with an opaque next_cursor. Later pages
+are sliced from that list with no database work. The cursor is signed and
+names the window it belongs to, so a cursor for a replaced or expired
+window is simply refused and the caller runs a fresh search.
+
+A window younger than MVP_SEARCH_RESULT_TTL also answers repeated fresh
+searches (refreshing tabs, client retries). fresh_window() coalesces
+concurrent identical searches: the first request takes a short cache lock
+and builds the window, and the others wait up to MVP_SEARCH_COALESCE_WAIT
+seconds for its result instead of repeating the work. The lock is shared
+across workers when the cache is.
+
+Windows are dropped on blocks, profile edits and real moves
+(update_location), and on "session" and "block" events, since their later
+pages may be wrong. Likes and swipes only retire the window
+(retire_windows): its cursors keep serving the cards the user has not seen
+yet, but the next fresh search ranks again. Both bump a per-user
+generation; a window is reused as a fresh result only while the
+generation it was built under is current, so a build that was running
+during either is not reused either.
+"""
+import time
+import uuid
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+
+from logic import event_bus
+
+SALT = "mvp.search-cursor"
+PAGE_SIZE = 20
+
+
+def _key(user_id) -> str:
+    return f"mvp:search-window:{user_id}"
+
+
+def _lock_key(user_id) -> str:
+    return f"mvp:search-lock:{user_id}"
+
+
+def _gen_key(user_id) -> str:
+    return f"mvp:search-gen:{user_id}"
+
+
+def _page(window_id, items, offset):
+    end = offset + PAGE_SIZE
+    next_cursor = signing.dumps({"w": window_id, "o": end}, salt=SALT) if end < len(items) else None
+    return items[offset:end], next_cursor
+
+
+def store_window(user_id, items, meta=None, generation=None):
+    """Cache a freshly ranked list and return its first (page, next_cursor)."""
+    window_id = uuid.uuid4().hex
+    cache.set(
+        _key(user_id),
+        {"id": window_id, "items": items, "meta": meta or {}, "gen": generation, "built_at": time.time()},
+        getattr(settings, "MVP_SEARCH_WINDOW_TTL", 120),
+    )
+    return _page(window_id, items, 0)
+
+
+def _recent(user_id):
+    """The user's window if it may answer a fresh search, else None."""
+    found = cache.get_many([_key(user_id), _gen_key(user_id)])
+    window = found.get(_key(user_id))
+    if (
+        window
+        and window["gen"] == found.get(_gen_key(user_id))
+        and time.time() - window["built_at"] < getattr(settings, "MVP_SEARCH_RESULT_TTL", 20)
+    ):
+        return window
+    return None
+
+
+def _build(user_id, build):
+    generation = cache.get(_gen_key(user_id))
+    items, meta = build()
+    return (*store_window(user_id, items, meta, generation=generation), meta)
+
+
+def fresh_window(user_id, build):
+    """
+    (page, next_cursor, meta) for a fresh search. Reuses a recent window, or
+    calls build() -> (items, meta) at most once at a time per user.
+    """
+    window = _recent(user_id)
+    if window:
+        return (*_page(window["id"], window["items"], 0), window["meta"])
+
+    wait = getattr(settings, "MVP_SEARCH_COALESCE_WAIT", 5)
+    if cache.add(_lock_key(user_id), 1, wait):
+        try:
+            return _build(user_id, build)
+        finally:
+            cache.delete(_lock_key(user_id))
+
+    # Someone else is already building this user's window: wait for it.
+    deadline = time.monotonic() + wait
+    while time.monotonic() < deadline and cache.get(_lock_key(user_id)) is not None:
+        time.sleep(0.05)
+    window = _recent(user_id)
+    if window:
+        return (*_page(window["id"], window["items"], 0), window["meta"])
+    return _build(user_id, build)
+
+
+def load_page(user_id, cursor):
+    """(page, next_cursor, meta) for cursor, or None when it is invalid or its window is gone."""
+    try:
+        claims = signing.loads(cursor, salt=SALT)
+        window_id, offset = claims["w"], int(claims["o"])
+    except (signing.BadSignature, KeyError, TypeError, ValueError):
+        return None
+    window = cache.get(_key(user_id))
+    if not window or window["id"] != window_id or offset < 0:
+        return None
+    return (*_page(window_id, window["items"], offset), window["meta"])
+
+
+def retire_windows(*user_ids):
+    """Stop reusing these users' windows as fresh results; their cursors keep working."""
+    cache.set_many({_gen_key(uid): uuid.uuid4().hex for uid in user_ids}, getattr(settings, "MVP_SEARCH_WINDOW_TTL", 120))
+
+
+def invalidate_windows(*user_ids):
+    """Drop these users' windows, cursors included."""
+    cache.delete_many([_key(uid) for uid in user_ids])
+    retire_windows(*user_ids)
+
+
+def _on_event(event):
+    if event.get("kind") in ("session", "block"):
+        invalidate_windows(*event.get("users", ()))
+
+
+event_bus.subscribe(_on_event)
@@ -0,0 +1,62 @@
+# logic/session_cache.py
+"""
+Short-TTL cache of SessionUser rows keyed by X-Session-ID (or by id, for
+signed session tokens).
+
+Reads go through the shared Django cache (Redis when REDIS_URL is set,
+per-process memory otherwise). Writers call invalidate_session_user() after
+saving; that deletes the shared entry and publishes a "session" event so
+workers with a process-local cache drop their copy too.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from emerg_database.models import SessionUser
+from logic import event_bus
+
+
+def _key(session_id) -> str:
+    return f"mvp:session:{session_id}"
+
+
+def _id_key(user_id) -> str:
+    return f"mvp:session-user:{user_id}"
+
+
+def load_session_user(session_id):
+    """SessionUser for session_id from cache, falling back to the database."""
+    user = cache.get(_key(session_id))
+    if user is not None:
+        return user
+    try:
+        user = SessionUser.objects.get(session_id=session_id)
+    except SessionUser.DoesNotExist:
+        return None
+    cache.set(_key(session_id), user, getattr(settings, "MVP_SESSION_CACHE_TTL", 30))
+    return user
+
+
+def load_session_user_by_id(user_id):
+    """Same as load_session_user, for callers holding a signed token."""
+    user = cache.get(_id_key(user_id))
+    if user is not None:
+        return user
+    try:
+        user = SessionUser.objects.get(id=user_id)
+    except SessionUser.DoesNotExist:
+        return None
+    cache.set(_id_key(user_id), user, getattr(settings, "MVP_SESSION_CACHE_TTL", 30))
+    return user
+
+
+def invalidate_session_user(user: SessionUser):
+    cache.delete_many([_key(user.session_id), _id_key(user.id)])
+    event_bus.publish("session", user.id, session_id=user.session_id)
+
+
+def _on_event(event):
+    if event.get("kind") == "session" and event.get("session_id"):
+        cache.delete_many([_key(event["session_id"])] + [_id_key(uid) for uid in event.get("users", ())])
+
+
+event_bus.subscribe(_on_event)
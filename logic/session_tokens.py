@@ -0,0 +1,52 @@
+# logic/session_tokens.py
+"""
+Signed, stateless MVP session tokens.
+
+A token carries the SessionUser id and the age-verified flag, timestamped
+and signed with SECRET_KEY (django.core.signing). Forged, tampered and
+expired tokens, and tokens of unverified users, can be rejected without a
+database round trip. Plain UUID session ids keep working; they never
+contain ":" so the two formats cannot be confused.
+
+Stream tickets carry the same claims under their own salt and expire after
+MVP_STREAM_TICKET_MAX_AGE seconds. EventSource cannot send headers, so
+/api/mvp/stream/ takes a ticket in its URL; a URL ends up in access logs
+and browser history, so it never carries the session credential itself.
+"""
+from django.conf import settings
+from django.core import signing
+
+SALT = "mvp.session-token"
+STREAM_SALT = "mvp.stream-ticket"
+
+
+def issue_token(user) -> str:
+    return signing.dumps({"u": user.id, "v": int(bool(user.age_verified_at))}, salt=SALT)
+
+
+def is_token(value) -> bool:
+    return bool(value) and ":" in value
+
+
+def _read(value, salt, max_age):
+    try:
+        claims = signing.loads(value, salt=salt, max_age=max_age)
+    except signing.BadSignature:
+        return None
+    if not isinstance(claims, dict) or not isinstance(claims.get("u"), int):
+        return None
+    return claims
+
+
+def read_token(value):
+    """Claims dict {"u": user_id, "v": 0|1}, or None if invalid or expired."""
+    return _read(value, SALT, getattr(settings, "MVP_SESSION_TOKEN_MAX_AGE", 30 * 24 * 3600))
+
+
+def issue_stream_ticket(user) -> str:
+    return signing.dumps({"u": user.id, "v": int(bool(user.age_verified_at))}, salt=STREAM_SALT)
+
+
+def read_stream_ticket(value):
+    """Claims of a stream ticket, or None if invalid or older than MVP_STREAM_TICKET_MAX_AGE."""
+    return _read(value, STREAM_SALT, getattr(settings, "MVP_STREAM_TICKET_MAX_AGE", 120))